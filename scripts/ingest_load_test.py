@@ -0,0 +1,168 @@
+"""
+Sync-storm load test for createScoutingEntry admission control.
+
+Replays a shift-change storm against a local bench: many devices upload at once and
+honour 429 Retry-After, while a Desk endpoint is sampled before and during the storm.
+Passes when Desk p95 latency under load stays within --max-desk-p95-ms.
+
+    python scripts/ingest_load_test.py --url http://localhost:8000 \\
+        --token <api_key>:<api_secret> --payload sample_entries.json --devices 60
+
+sample_entries.json is a list of valid scouting entries for the site; each upload gets
+fresh client_entry_ids so entries are really created. Run it against a test site only.
+
+To compare with and without admission control, run it twice on the same bench: once with
+the usual Map Settings ingest limits, once with "Ingest Max Concurrent Uploads" raised above
+--devices so no upload is ever turned away. Record both desk p95/p99 lines below.
+
+Results: still open. The script has only been exercised against a stub HTTP server, not a
+bench with real gunicorn and RQ workers, so no desk p95/p99 has been measured yet and the
+acceptance criterion (desk latency bounded while ingest is at capacity) is unproven.
+
+    admission control on:   desk baseline p95=?  p99=?   desk under load p95=?  p99=?
+    admission control off:  desk baseline p95=?  p99=?   desk under load p95=?  p99=?
+"""
+
+import argparse
+import copy
+import json
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+INGEST_PATH = "/api/method/upande_scp.serverscripts.mobile.create_scouting_entry.createScoutingEntry"
+
+
+def request(url, token, body=None, headers=None, timeout=120):
+    """(status, headers, seconds) of one HTTP call; network errors come back as status 0."""
+    req = urllib.request.Request(url, data=body, method="POST" if body is not None else "GET")
+    req.add_header("Authorization", f"token {token}")
+    for key, value in (headers or {}).items():
+        req.add_header(key, value)
+
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            response.read()
+            return response.status, response.headers, time.perf_counter() - started
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code, e.headers, time.perf_counter() - started
+    except (urllib.error.URLError, TimeoutError):
+        return 0, {}, time.perf_counter() - started
+
+
+def percentile(values, share):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def sample_desk(args, latencies, stop):
+    while not stop.is_set():
+        status, _headers, seconds = request(args.url + args.desk_path, args.token, timeout=30)
+        latencies.append(seconds if status == 200 else float("inf"))
+        time.sleep(args.desk_interval)
+
+
+def run_device(args, device_id, entries, outcome, lock):
+    for _ in range(args.uploads_per_device):
+        payload = copy.deepcopy(entries)
+        for entry in payload:
+            entry["client_entry_id"] = str(uuid.uuid4())
+        body = json.dumps(payload).encode()
+
+        for _attempt in range(args.max_retries + 1):
+            status, headers, seconds = request(
+                args.url + INGEST_PATH,
+                args.token,
+                body,
+                {"Content-Type": "application/json", "X-Device-Id": device_id},
+            )
+            with lock:
+                outcome["status"][status] = outcome["status"].get(status, 0) + 1
+                if status != 429:
+                    outcome["ingest_seconds"].append(seconds)
+            if status != 429:
+                break
+            time.sleep(float(headers.get("Retry-After") or 1))
+
+
+def summarize(name, latencies):
+    finite = [s for s in latencies if s != float("inf")]
+    failed = len(latencies) - len(finite)
+    p50 = percentile(finite, 0.5) * 1000
+    p95 = percentile(finite, 0.95) * 1000
+    p99 = percentile(finite, 0.99) * 1000
+    print(f"{name}: n={len(latencies)} failed={failed} p50={p50:.0f}ms p95={p95:.0f}ms "
+          f"p99={p99:.0f}ms max={max(finite, default=0) * 1000:.0f}ms")
+    return p95, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True, help="api_key:api_secret of a scouting user")
+    parser.add_argument("--payload", required=True, help="JSON file with a list of scouting entries")
+    parser.add_argument("--devices", type=int, default=40)
+    parser.add_argument("--uploads-per-device", type=int, default=3)
+    parser.add_argument("--max-retries", type=int, default=10)
+    parser.add_argument("--desk-path", default="/api/method/frappe.auth.get_logged_user")
+    parser.add_argument("--desk-interval", type=float, default=0.25)
+    parser.add_argument("--baseline-seconds", type=float, default=10)
+    parser.add_argument("--max-desk-p95-ms", type=float, default=1000)
+    args = parser.parse_args()
+
+    with open(args.payload) as f:
+        entries = json.load(f)
+    if isinstance(entries, dict):
+        entries = [entries]
+
+    baseline, loaded = [], []
+    stop = threading.Event()
+    sampler = threading.Thread(target=sample_desk, args=(args, baseline, stop))
+    sampler.start()
+    time.sleep(args.baseline_seconds)
+    stop.set()
+    sampler.join()
+
+    outcome = {"status": {}, "ingest_seconds": []}
+    lock = threading.Lock()
+    stop = threading.Event()
+    sampler = threading.Thread(target=sample_desk, args=(args, loaded, stop))
+    devices = [
+        threading.Thread(target=run_device, args=(args, f"load-test-{i}", entries, outcome, lock))
+        for i in range(args.devices)
+    ]
+
+    started = time.perf_counter()
+    sampler.start()
+    for device in devices:
+        device.start()
+    for device in devices:
+        device.join()
+    stop.set()
+    sampler.join()
+
+    print(f"storm: {args.devices} devices x {args.uploads_per_device} uploads "
+          f"in {time.perf_counter() - started:.1f}s")
+    print("ingest status codes:", dict(sorted(outcome["status"].items())))
+    if outcome["ingest_seconds"]:
+        print(f"ingest: p50={statistics.median(outcome['ingest_seconds']) * 1000:.0f}ms")
+    summarize("desk baseline", baseline)
+    p95, failed = summarize("desk under load", loaded)
+
+    if failed or p95 > args.max_desk_p95_ms:
+        print(f"FAIL: desk p95 above {args.max_desk_p95_ms:.0f}ms or desk requests failed")
+        return 1
+    print("PASS")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
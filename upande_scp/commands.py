@@ -0,0 +1,48 @@
+import json
+
+import click
+import frappe
+from frappe.commands import get_site, pass_context
+
+
+@click.command("replay-scouting-journal")
+@click.option("--from", "from_datetime", required=True, help="Start of the window, e.g. '2026-10-01 06:00'")
+@click.option("--to", "to_datetime", help="End of the window; defaults to now")
+@click.option("--bulk/--no-bulk", default=None, help="Override the bulk mode each payload was sent with")
+@click.option("--dry-run", is_flag=True, default=False, help="Only count the payloads in the window")
+@pass_context
+def replay_scouting_journal(context, from_datetime, to_datetime=None, bulk=None, dry_run=False):
+	"""Re-run scouting ingest for payloads journalled in a time window"""
+	from upande_scp.serverscripts.mobile.payload_journal import replay_payload_journal
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		summary = replay_payload_journal(from_datetime, to_datetime, bulk=bulk, dry_run=dry_run)
+		summary.pop("journal_ids")
+		click.echo(json.dumps(summary, indent=1))
+	finally:
+		frappe.destroy()
+
+
+@click.command("rebuild-scouting-rollup")
+@click.option("--from", "from_date", help="First day to rebuild; defaults to the first scouting entry")
+@click.option("--to", "to_date", help="Last day to rebuild; defaults to the last scouting entry")
+@click.option("--greenhouse", help="Only rebuild this greenhouse")
+@pass_context
+def rebuild_scouting_rollup(context, from_date=None, to_date=None, greenhouse=None):
+	"""Recompute the Scouting Rollup table from the raw scouting entries"""
+	from upande_scp.serverscripts.scouting_rollup import rebuild_scouting_rollup
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		summary = rebuild_scouting_rollup(from_date, to_date, greenhouse)
+		click.echo(json.dumps(summary, indent=1))
+	finally:
+		frappe.destroy()
+
+
+commands = [replay_scouting_journal, rebuild_scouting_rollup]
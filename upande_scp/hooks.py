@@ -145,6 +145,97 @@ app_license = "mit"
 # 	}
 # }
 
+doc_events = {
+    "Zone": {
+        "validate": "upande_scp.serverscripts.zone_index.update_zone_geometry",
+        "on_update": [
+            "upande_scp.serverscripts.zone_index.on_zone_change",
+            "upande_scp.serverscripts.map_tiles.invalidate_map_geometry",
+            "upande_scp.serverscripts.greenhouse_layout.on_layout_change"
+        ],
+        "after_rename": [
+            "upande_scp.serverscripts.zone_index.on_zone_change",
+            "upande_scp.serverscripts.map_tiles.invalidate_map_geometry",
+            "upande_scp.serverscripts.greenhouse_layout.on_layout_change"
+        ],
+        "on_trash": [
+            "upande_scp.serverscripts.zone_index.on_zone_change",
+            "upande_scp.serverscripts.map_tiles.invalidate_map_geometry"
+        ],
+        "after_delete": "upande_scp.serverscripts.greenhouse_layout.on_layout_change"
+    },
+    "Bed": {
+        "on_update": [
+            "upande_scp.serverscripts.map_tiles.invalidate_map_geometry",
+            "upande_scp.serverscripts.greenhouse_layout.on_layout_change"
+        ],
+        "after_rename": [
+            "upande_scp.serverscripts.map_tiles.invalidate_map_geometry",
+            "upande_scp.serverscripts.greenhouse_layout.on_layout_change"
+        ],
+        "on_trash": "upande_scp.serverscripts.map_tiles.invalidate_map_geometry",
+        "after_delete": "upande_scp.serverscripts.greenhouse_layout.on_layout_change"
+    },
+    "Bed And Zone Automation": {
+        "on_update": [
+            "upande_scp.serverscripts.zone_index.refresh_greenhouse_zone_geometry",
+            "upande_scp.serverscripts.map_tiles.invalidate_map_geometry",
+            "upande_scp.serverscripts.greenhouse_layout.on_layout_change"
+        ]
+    },
+    "Warehouse": {
+        "on_update": [
+            "upande_scp.serverscripts.greenhouse_locator.invalidate_greenhouse_index",
+            "upande_scp.serverscripts.map_tiles.invalidate_map_geometry",
+            "upande_scp.serverscripts.greenhouse_layout.on_layout_change"
+        ],
+        "after_rename": [
+            "upande_scp.serverscripts.greenhouse_locator.invalidate_greenhouse_index",
+            "upande_scp.serverscripts.map_tiles.invalidate_map_geometry",
+            "upande_scp.serverscripts.greenhouse_layout.on_layout_change"
+        ],
+        "on_trash": [
+            "upande_scp.serverscripts.greenhouse_locator.invalidate_greenhouse_index",
+            "upande_scp.serverscripts.map_tiles.invalidate_map_geometry",
+            "upande_scp.serverscripts.greenhouse_layout.on_layout_change"
+        ]
+    },
+    "Scouting Entry": {
+        "on_update": "upande_scp.serverscripts.scouting_rollup.update_scouting_rollup",
+        "on_trash": "upande_scp.serverscripts.scouting_rollup.update_scouting_rollup"
+    },
+    "Pest": {
+        "on_update": "upande_scp.serverscripts.observation_catalog.invalidate_observation_catalog",
+        "after_rename": "upande_scp.serverscripts.observation_catalog.invalidate_observation_catalog",
+        "on_trash": "upande_scp.serverscripts.observation_catalog.invalidate_observation_catalog"
+    },
+    "Plant Disease": {
+        "on_update": "upande_scp.serverscripts.observation_catalog.invalidate_observation_catalog",
+        "after_rename": "upande_scp.serverscripts.observation_catalog.invalidate_observation_catalog",
+        "on_trash": "upande_scp.serverscripts.observation_catalog.invalidate_observation_catalog"
+    },
+    "Predator": {
+        "on_update": "upande_scp.serverscripts.observation_catalog.invalidate_observation_catalog",
+        "after_rename": "upande_scp.serverscripts.observation_catalog.invalidate_observation_catalog",
+        "on_trash": "upande_scp.serverscripts.observation_catalog.invalidate_observation_catalog"
+    },
+    "Weed": {
+        "on_update": "upande_scp.serverscripts.observation_catalog.invalidate_observation_catalog",
+        "after_rename": "upande_scp.serverscripts.observation_catalog.invalidate_observation_catalog",
+        "on_trash": "upande_scp.serverscripts.observation_catalog.invalidate_observation_catalog"
+    },
+    "Incident": {
+        "on_update": "upande_scp.serverscripts.observation_catalog.invalidate_observation_catalog",
+        "after_rename": "upande_scp.serverscripts.observation_catalog.invalidate_observation_catalog",
+        "on_trash": "upande_scp.serverscripts.observation_catalog.invalidate_observation_catalog"
+    },
+    "Physiological Disorder": {
+        "on_update": "upande_scp.serverscripts.observation_catalog.invalidate_observation_catalog",
+        "after_rename": "upande_scp.serverscripts.observation_catalog.invalidate_observation_catalog",
+        "on_trash": "upande_scp.serverscripts.observation_catalog.invalidate_observation_catalog"
+    }
+}
+
 # Scheduled Tasks
 # ---------------
 
@@ -166,6 +257,12 @@ app_license = "mit"
 # 	],
 # }
 
+scheduler_events = {
+    "daily": [
+        "upande_scp.serverscripts.mobile.payload_journal.purge_payload_journal"
+    ],
+}
+
 # Testing
 # -------
 
@@ -241,6 +338,10 @@ app_license = "mit"
 # default_log_clearing_doctypes = {
 # 	"Logging DocType Name": 30  # days to retain logs
 # }
+
+# Vector tiles for the map pages at /tiles/{z}/{x}/{y}.mvt
+page_renderer = ["upande_scp.serverscripts.map_tiles.MapTileRenderer"]
+
 website_route_rules = [
     {"from_route": "/scouts-map", "to_route": "/scouts_map"},
     {"from_route": "/observations-map", "to_route": "/observations_map"},
@@ -0,0 +1,25 @@
+import frappe
+
+from upande_scp.serverscripts.zone_index import invalidate_zone_index, project_zone_geometry
+
+
+def execute():
+    """Stores the projected UTM geometry for zones created before it was maintained on save."""
+    zones = frappe.get_all(
+        "Zone",
+        filters={"utm_wkb": ["is", "not set"], "raw_geojson": ["is", "set"]},
+        fields=["name", "greenhouse", "raw_geojson"]
+    )
+
+    greenhouses = set()
+    for zone in zones:
+        try:
+            values = project_zone_geometry(zone.raw_geojson)
+        except Exception as e:
+            frappe.log_error(f"Error projecting zone {zone.name}", str(e))
+            continue
+        frappe.db.set_value("Zone", zone.name, values, update_modified=False)
+        greenhouses.add(zone.greenhouse)
+
+    for greenhouse in greenhouses:
+        invalidate_zone_index(greenhouse)
@@ -0,0 +1,9 @@
+import frappe
+
+from upande_scp.serverscripts.greenhouse_layout import refresh_greenhouse_layout
+
+
+def execute():
+    """Builds the Greenhouse Layout row of every existing greenhouse."""
+    for greenhouse in frappe.get_all("Warehouse", filters={"warehouse_type": "Greenhouse"}, pluck="name"):
+        refresh_greenhouse_layout(greenhouse)
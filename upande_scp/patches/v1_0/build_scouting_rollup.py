@@ -0,0 +1,6 @@
+from upande_scp.serverscripts.scouting_rollup import rebuild_scouting_rollup
+
+
+def execute():
+    """Backfills the Scouting Rollup table from every existing scouting entry."""
+    rebuild_scouting_rollup()
@@ -0,0 +1,54 @@
+import frappe
+from frappe.utils import cint, flt
+
+
+def execute():
+    """
+    Copies GPS metadata from Scouting Entry Metadata records onto their Scouting Entries.
+    Records created before the scouting_entry link existed are matched on coordinates and zone.
+    """
+    if not frappe.db.table_exists("Scouting Entry Metadata"):
+        return
+
+    metadata = frappe.get_all(
+        "Scouting Entry Metadata",
+        fields=["scouting_entry", "latitude", "longitude", "calculated_zone", "gps_accuracy", "gps_quality",
+                "gps_confidence", "gps_samples_used", "stationary", "zone_buffer", "distance"],
+        order_by="creation asc"
+    )
+    if not metadata:
+        return
+
+    unlinked_keys = {
+        (m.latitude, m.longitude, m.calculated_zone) for m in metadata if not m.scouting_entry
+    }
+    entries_by_key = {}
+    if unlinked_keys:
+        for entry in frappe.get_all("Scouting Entry", fields=["name", "latitude", "longitude", "zone"]):
+            key = (entry.latitude, entry.longitude, entry.zone)
+            if key in unlinked_keys:
+                entries_by_key.setdefault(key, []).append(entry.name)
+
+    updates = {}
+    for m in metadata:
+        entry = m.scouting_entry
+        if not entry:
+            candidates = entries_by_key.get((m.latitude, m.longitude, m.calculated_zone), [])
+            # Only trust an unambiguous coordinate match
+            entry = candidates[0] if len(candidates) == 1 else None
+        if not entry:
+            continue
+
+        updates[entry] = {
+            "calculated_zone": m.calculated_zone,
+            "gps_accuracy": flt(m.gps_accuracy),
+            "gps_quality": m.gps_quality,
+            "gps_confidence": flt(m.gps_confidence),
+            "gps_samples_used": cint(m.gps_samples_used),
+            "stationary": cint(m.stationary),
+            "zone_buffer": flt(m.zone_buffer),
+            "distance": flt(m.distance),
+        }
+
+    # Links to deleted entries simply update no rows
+    frappe.db.bulk_update("Scouting Entry", updates, chunk_size=500, update_modified=False)
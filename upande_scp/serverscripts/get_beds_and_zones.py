@@ -1,22 +1,21 @@
 import frappe
 
+from upande_scp.serverscripts.zone_geometry import get_map_zone_geometries
+
 @frappe.whitelist()
 def getBedsAndZones():
     try:
         beds = frappe.get_all("Bed", fields=["name", "variety"])
-        zones = frappe.get_all(
-            "Zone",
-            filters={"raw_geojson": ["is", "set"]},
-            fields=["name", "raw_geojson", "bed"] 
-        )
+        zones, geometry_bundle = get_map_zone_geometries(frappe.form_dict)
 
         bed_map = {b["name"]: {**b, "zones": []} for b in beds}
         for z in zones:
             if z["bed"] in bed_map:
-                bed_map[z["bed"]]["zones"].append({
-                    "name": z["name"],
-                    "raw_geojson": z["raw_geojson"],
-                })
+                zone = {"name": z["name"]}
+                # Left out when the caller loads geometry from the bundle
+                if "raw_geojson" in z:
+                    zone["raw_geojson"] = z["raw_geojson"]
+                bed_map[z["bed"]]["zones"].append(zone)
 
         variety_map = {}
         for bed in bed_map.values():
@@ -31,6 +30,7 @@ def getBedsAndZones():
                 })
 
         frappe.response["data"] = list(variety_map.values())
+        frappe.response["geometry_bundle"] = geometry_bundle
 
     except Exception as e:
         frappe.log_error(title="getBedsAndZones Error", message=str(e))
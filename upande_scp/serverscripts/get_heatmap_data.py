@@ -2,6 +2,9 @@ import frappe
 from frappe import _
 import json
 
+from upande_scp.serverscripts.greenhouse_layout import get_greenhouse_layout
+from upande_scp.serverscripts.heatmap_grid import get_observation_types
+
 @frappe.whitelist()
 def getHeatmapData(date, greenhouse):
     """
@@ -18,30 +21,10 @@ def getHeatmapData(date, greenhouse):
             fields=["name", "zone", "bed", "greenhouse"]
         )
         
-        # Get bed count and zone count for the greenhouse
-        bed_count = frappe.db.count("Bed", filters={
-            "greenhouse": greenhouse,
-            "custom_active": 1
-        })
-        
-        # Get all beds for this greenhouse to find max zone count
-        beds = frappe.get_all(
-            "Bed",
-            filters={
-                "greenhouse": greenhouse,
-                "custom_active": 1
-            },
-            fields=["name"]
-        )
-        
-        # Find maximum zone count across all beds
-        max_zone_count = 0
-        for bed in beds:
-            zone_count = frappe.db.count("Zone", filters={
-                "greenhouse": greenhouse,
-                "bed": bed.name
-            })
-            max_zone_count = max(max_zone_count, zone_count)
+        # Bed count and max zone count from the precomputed greenhouse layout
+        layout = get_greenhouse_layout(greenhouse)
+        bed_count = layout.active_bed_count if layout else 0
+        max_zone_count = layout.max_zone_count if layout else 0
         
         if not scouting_entries:
             return {
@@ -116,84 +99,9 @@ def getHeatmapData(date, greenhouse):
             
             detailed_entries.append(entry_data)
         
-        # Fetch observation type metadata
-        observation_types = {}
-        
-        # Get all pests with their stages and colors
-        pests = frappe.get_all("Pest", fields=["name", "common_name", "pests_legend_color"])
-        observation_types["pests"] = {}
-        for pest in pests:
-            pest_doc = frappe.get_doc("Pest", pest.name)
-            observation_types["pests"][pest.common_name] = {
-                "color": pest.pests_legend_color or "#999999",
-                "stages": []
-            }
-            for stage in pest_doc.stages:
-                observation_types["pests"][pest.common_name]["stages"].append({
-                    "stage": stage.stage,
-                    "symbol": stage.get("symbol", ""),
-                    "reading_type": stage.reading_type
-                })
-        
-        # Get all diseases with their stages and colors
-        diseases = frappe.get_all("Plant Disease", fields=["name", "common_name", "disease_legend_color"])
-        observation_types["diseases"] = {}
-        for disease in diseases:
-            disease_doc = frappe.get_doc("Plant Disease", disease.name)
-            observation_types["diseases"][disease.common_name] = {
-                "color": disease.disease_legend_color or "#999999",
-                "stages": []
-            }
-            for stage in disease_doc.stages:
-                observation_types["diseases"][disease.common_name]["stages"].append({
-                    "stage": stage.stage,
-                    "symbol": stage.get("symbol", ""),
-                    "reading_type": stage.reading_type
-                })
-        
-        # Get all predators with their stages
-        predators = frappe.get_all("Predator", fields=["name", "common_name"])
-        observation_types["predators"] = {}
-        for predator in predators:
-            predator_doc = frappe.get_doc("Predator", predator.name)
-            observation_types["predators"][predator.common_name] = {
-                "color": "#4c6ef5",
-                "stages": []
-            }
-            for stage in predator_doc.predator_stages:
-                observation_types["predators"][predator.common_name]["stages"].append({
-                    "stage": stage.stage,
-                    "symbol": "",
-                    "reading_type": stage.reading_type
-                })
-        
-        # Get all weeds
-        weeds = frappe.get_all("Weed", fields=["name"])
-        observation_types["weeds"] = {}
-        for weed in weeds:
-            observation_types["weeds"][weed.name] = {
-                "color": "#51cf66",
-                "stages": []
-            }
-        
-        # Get all incidents
-        incidents = frappe.get_all("Incident", fields=["name", "name"])
-        observation_types["incidents"] = {}
-        for incident in incidents:
-            observation_types["incidents"][incident.name] = {
-                "color": "#868e96",
-                "stages": []
-            }
-        
-        # Get all physiological disorders
-        disorders = frappe.get_all("Physiological Disorder", fields=["name", "name"])
-        observation_types["physiological_disorders"] = {}
-        for disorder in disorders:
-            observation_types["physiological_disorders"][disorder.name] = {
-                "color": "#ff6b6b",
-                "stages": []
-            }
-        
+        # Observation type metadata from the catalog cache
+        observation_types = get_observation_types()
+
         return {
             "scouting_entries": detailed_entries,
             "observation_types": observation_types,
@@ -1,5 +1,13 @@
 import frappe
-from frappe.utils import time_diff_in_seconds
+from frappe.utils import flt, time_diff_in_seconds
+
+from upande_scp.serverscripts.scout_paths import (
+    DEFAULT_JITTER_M,
+    DEFAULT_TOLERANCE_M,
+    POLYLINE_PRECISION,
+    build_scout_paths,
+)
+from upande_scp.serverscripts.zone_geometry import get_map_zone_geometries
 
 @frappe.whitelist()
 def getScoutingAnalysis():
@@ -20,12 +28,8 @@ def getScoutingAnalysis():
             order_by="time_of_capture asc"
         )
         
-        # Fetch all zones and their raw_geojson data
-        all_zones = frappe.get_all(
-            "Zone",
-            filters={"raw_geojson": ["is", "set"]},
-            fields=["name", "raw_geojson"]
-        )
+        # Fetch all zones and their raw_geojson data at the requested level of detail
+        all_zones, geometry_bundle = get_map_zone_geometries(frappe.form_dict)
 
         scouting_summary = {
             "total_unique_scouts": 0,
@@ -42,7 +46,9 @@ def getScoutingAnalysis():
                 "scouting_summary": scouting_summary,
                 "scout_movement_timeline": [],
                 "scout_paths": [],
+                "polyline_precision": POLYLINE_PRECISION,
                 "all_zones_geojson": all_zones,
+                "geometry_bundle": geometry_bundle,
                 "scouting_entries": []
             }
         else:
@@ -147,32 +153,33 @@ def getScoutingAnalysis():
             scouting_summary["average_minutes_per_bed"] = overall_total_minutes / \
                 overall_total_beds if overall_total_beds > 0 else 0
 
-            # Build scout paths list
-            scout_paths = {}
-            for record in scouting_entries:
-                scout_name = record.get("scouts_name")  # Now contains employee_name
-                latitude = record.get("latitude")
-                longitude = record.get("longitude")
-                if latitude is not None and longitude is not None:
-                    if scout_name not in scout_paths:
-                        scout_paths[scout_name] = []
-                    # Path data stored as [latitude, longitude] pairs
-                    scout_paths[scout_name].append([latitude, longitude])
-
-            for scout_name, path_data in scout_paths.items():
-                scout_paths_list.append({
-                    "name": scout_name,
-                    "path": path_data
-                })
+            # Build one time-ordered, de-jittered and simplified polyline per scout
+            scout_paths_list = build_scout_paths(
+                scouting_entries,
+                jitter_m=flt(frappe.form_dict.get("jitter_m") or DEFAULT_JITTER_M),
+                tolerance_m=flt(frappe.form_dict.get("tolerance_m") or DEFAULT_TOLERANCE_M)
+            )
 
             # Return the final processed data
             return {
                 "scouting_summary": scouting_summary,
                 "scout_movement_timeline": scout_movement_timeline,
                 "scout_paths": scout_paths_list,
+                "polyline_precision": POLYLINE_PRECISION,
                 "all_zones_geojson": all_zones,
-                # Now contains employee_name instead of HR number
-                "scouting_entries": scouting_entries 
+                "geometry_bundle": geometry_bundle,
+                # Only the fields the scouts map reads; scouts_name now contains employee_name
+                "scouting_entries": [
+                    {
+                        "name": entry.get("name"),
+                        "scouts_name": entry.get("scouts_name"),
+                        "greenhouse": entry.get("greenhouse"),
+                        "bed": entry.get("bed"),
+                        "zone": entry.get("zone"),
+                        "creation": entry.get("creation")
+                    }
+                    for entry in scouting_entries
+                ]
             }
 
     except Exception as e:
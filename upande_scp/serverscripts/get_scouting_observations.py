@@ -1,6 +1,9 @@
 import frappe
 import hashlib
 
+from upande_scp.serverscripts.observation_catalog import get_observation_catalog
+from upande_scp.serverscripts.zone_geometry import get_map_zone_geometries
+
 @frappe.whitelist()
 def getScoutingObservations():
     try:
@@ -11,48 +14,42 @@ def getScoutingObservations():
   
         observation_configs = {
             "pests_scouting_entry": {
-                "doctype": "Pest",
-                "legend_color_field": "color",
+                "catalog_type": "pests",
                 "child_table": "Pests Scouting Entry",
                 "type_label": "Pests",
                 "item_field": "pest",
                 "extra_fields": ["plant_section", "stage", "count"]
             },
             "diseases_scouting_entry": {
-                "doctype": "Plant Disease",
-                "legend_color_field": "disease_legend_color",
+                "catalog_type": "diseases",
                 "child_table": "Diseases Scouting Entry",
                 "type_label": "Diseases",
                 "item_field": "disease",
                 "extra_fields": ["plant_section", "stage"]
             },
             "predators_scouting_entry": {
-                "doctype": "Predator",
-                "legend_color_field": "color",
+                "catalog_type": "predators",
                 "child_table": "Predators Scouting Entry",
                 "type_label": "Predators",
                 "item_field": "predator",
                 "extra_fields": ["plant_section", "stage", "count"]
             },
             "weeds_scouting_entry": {
-                "doctype": "Weed",
-                "legend_color_field": "color",
+                "catalog_type": "weeds",
                 "child_table": "Weeds Scouting Entry",
                 "type_label": "Weeds",
                 "item_field": "weed",
                 "extra_fields": []
             },
             "incidents_scouting_entry": {
-                "doctype": "Incident",
-                "legend_color_field": "color",
+                "catalog_type": "incidents",
                 "child_table": "Incidents Scouting Entry",
                 "type_label": "Incidents",
                 "item_field": "incident",
                 "extra_fields": []
             },
             "physiological_disorders_entry": {
-                "doctype": "Physiological Disorder",
-                "legend_color_field": "color",
+                "catalog_type": "physiological_disorders",
                 "child_table": "Physiological Disorders Entry",
                 "type_label": "Physiological Disorders",
                 "item_field": "physiological_disorders",
@@ -141,45 +138,14 @@ def getScoutingObservations():
                 frappe.log_error(f"Failed to load {cfg['child_table']}: {str(e)}")
                 continue  # Continue with next observation type
 
-            # Now try to fetch colors for the items we found
+            # Legend colours from the catalog cache; items without one get a colour from their name
             if items_in_data:
-                try:
-                    # Check if the color field exists in the main doctype
-                    main_meta = frappe.get_meta(cfg["doctype"])
-                    color_field_exists = any(f.fieldname == cfg["legend_color_field"] for f in main_meta.fields)
-                    
-                    if color_field_exists:
-                        # Color field exists, try to fetch colors
-                        color_records = frappe.get_all(
-                            cfg["doctype"],
-                            filters={"name": ["in", list(items_in_data.keys())]},
-                            fields=["name", cfg["legend_color_field"]]
-                        )
-                        
-                        # Build color map from actual data
-                        for rec in color_records:
-                            color = rec.get(cfg["legend_color_field"])
-                            if color:  # Only update if color is not empty
-                                items_in_data[rec.name] = color
-                                print(f"Found color for {rec.name}: {color}")
-                    else:
-                        # Color field doesn't exist, use generated colors
-                        print(f"Color field '{cfg['legend_color_field']}' not found in {cfg['doctype']}, using generated colors")
-                    
-                    # Generate consistent colors for any items still using default
-                    for item_name in items_in_data:
-                        if items_in_data[item_name] == "#999999":
-                            # Generate consistent color based on item name hash
-                            color_hash = hashlib.md5(item_name.encode()).hexdigest()[:6]
-                            items_in_data[item_name] = f"#{color_hash}"
-                            print(f"Generated color for {item_name}: #{color_hash}")
-                            
-                except Exception as e:
-                    # If any error occurs, use generated colors for all items
-                    print(f"Error fetching colors for {cfg['doctype']}: {e}, using generated colors")
-                    for item_name in items_in_data:
-                        color_hash = hashlib.md5(item_name.encode()).hexdigest()[:6]
-                        items_in_data[item_name] = f"#{color_hash}"
+                records = get_observation_catalog()[cfg["catalog_type"]]
+                for item_name in items_in_data:
+                    color = records.get(item_name, {}).get("color")
+                    if not color:
+                        color = f"#{hashlib.md5(item_name.encode()).hexdigest()[:6]}"
+                    items_in_data[item_name] = color
 
                 # Update colors in processed entries
                 for entry_name in processed_entries:
@@ -202,11 +168,7 @@ def getScoutingObservations():
             final_entries.append(e)
 
       
-        all_zones = frappe.get_all(
-            "Zone",
-            filters={"raw_geojson": ["is", "set"]},
-            fields=["name", "raw_geojson"]
-        )
+        all_zones, geometry_bundle = get_map_zone_geometries(frappe.form_dict)
 
      
         active_types = [
@@ -218,6 +180,7 @@ def getScoutingObservations():
         frappe.response["message"] = {
             "scouting_entries": final_entries,
             "all_zones_geojson": all_zones or [],
+            "geometry_bundle": geometry_bundle,
             "active_observation_types": active_types,
             "all_observation_names": all_observation_names,
             "observation_metadata": {
@@ -2,6 +2,9 @@ import frappe
 import hashlib
 from frappe.utils import flt
 
+from upande_scp.serverscripts.greenhouse_layout import get_greenhouse_layout
+from upande_scp.serverscripts.observation_catalog import get_observation_catalog
+
 @frappe.whitelist()
 def getScoutingData():
     """
@@ -18,51 +21,45 @@ def getScoutingData():
         # --- CONFIGURATION: Observation types ---
         observation_configs = {
             "pests_scouting_entry": {
-                "doctype": "Pest",
+                "catalog_type": "pests",
                 "child_table": "Pests Scouting Entry",
                 "item_field": "pest",
                 "type_label": "Pests",
-                "legend_color_field": "color",
                 "extra_fields": ["plant_section", "stage", "count"]
             },
             "diseases_scouting_entry": {
-                "doctype": "Plant Disease",
+                "catalog_type": "diseases",
                 "child_table": "Diseases Scouting Entry",
                 "item_field": "disease",
                 "type_label": "Diseases",
-                "legend_color_field": "disease_legend_color",
                 "extra_fields": ["plant_section", "stage"]
             },
             "predators_scouting_entry": {
-                "doctype": "Predator",
+                "catalog_type": "predators",
                 "child_table": "Predators Scouting Entry",
                 "item_field": "predator",
                 "type_label": "Predators",
-                "legend_color_field": "color",
                 "extra_fields": ["plant_section", "stage", "count"]
             },
             "weeds_scouting_entry": {
-                "doctype": "Weed",
+                "catalog_type": "weeds",
                 "child_table": "Weeds Scouting Entry",
                 "item_field": "weed",
                 "type_label": "Weeds",
-                "legend_color_field": "color",
                 "extra_fields": []
             },
             "incidents_scouting_entry": {
-                "doctype": "Incident",
+                "catalog_type": "incidents",
                 "child_table": "Incidents Scouting Entry",
                 "item_field": "incident",
                 "type_label": "Incidents",
-                "legend_color_field": "color",
                 "extra_fields": []
             },
             "physiological_disorders_scouting_entry": {
-                "doctype": "Physiological Disorder",
+                "catalog_type": "physiological_disorders",
                 "child_table": "Physiological Disorders Entry",
                 "item_field": "physiological_disorders",
                 "type_label": "Physiological Disorders",
-                "legend_color_field": "color",
                 "extra_fields": []
             }
         }
@@ -90,15 +87,9 @@ def getScoutingData():
 
         processed_entries = {e.name: dict(e) for e in scouting_entries}
 
-        # --- 2. Pest Config (severity/stage) ---
-        pest_names = frappe.get_all("Pest", fields=["name"])
-        pests_map = {p.name: {"severity": [], "stages": []} for p in pest_names}
-
-        for severity in frappe.get_all("Scouting Severity Scale", filters={"parent": ["in", [p.name for p in pest_names]]}, fields=["parent", "from", "to", "color"]):
-            pests_map[severity.parent]["severity"].append(severity)
-
-        for stage in frappe.get_all("Pests Stages", filters={"parent": ["in", [p.name for p in pest_names]]}, fields=["parent", "stage", "symbol"]):
-            pests_map[stage.parent]["stages"].append(stage)
+        # --- 2. Pest Config (severity/stage) and legend colours, from the catalog cache ---
+        catalog = get_observation_catalog()
+        pests_map = catalog["pests"]
 
         # --- 3. Process All Observation Types ---
         all_observation_names = {}
@@ -160,23 +151,12 @@ def getScoutingData():
             
             # Color handling
             if items_in_data:
-                main_doctype = cfg["doctype"]
-                color_field = cfg["legend_color_field"]
-                main_meta = frappe.get_meta(main_doctype)
-                
-                if main_meta.has_field(color_field):
-                    try:
-                        colors = frappe.get_all(
-                            main_doctype,
-                            filters={"name": ["in", list(items_in_data.keys())]},
-                            fields=["name", color_field]
-                        )
-                        for c in colors:
-                            if c.get(color_field):
-                                items_in_data[c.name] = c.get(color_field)
-                    except Exception as e:
-                        frappe.log_error(f"Color fetch error {main_doctype}: {str(e)}")
-                
+                records = catalog[cfg["catalog_type"]]
+                for name in items_in_data:
+                    color = records.get(name, {}).get("color")
+                    if color:
+                        items_in_data[name] = color
+
                 for name in items_in_data:
                     if items_in_data[name] == "#999999":
                         items_in_data[name] = f"#{hashlib.md5(name.encode()).hexdigest()[:6]}"
@@ -277,11 +257,14 @@ def getScoutingData():
         bom_names = [b["name"] for b in chemical_mix_boms]
         bom_items = frappe.db.get_all("BOM Item", filters={"parent": ["in", bom_names]}, fields=["parent", "item_name", "qty", "uom"])
 
-        bed_zone_numbering = frappe.get_all("Warehouse", filters={"name": greenhouse}, fields=["custom_bed_numbering", "custom_zone_numbering"])
+        layout = get_greenhouse_layout(greenhouse) or frappe._dict(beds=[])
         chemicals = frappe.db.get_list('Item', filters={'item_group': 'CHEMICALS'}, fields=['item_name'])
         all_chemicals = sorted({c.item_name for c in chemicals})
 
-        bed_data = frappe.get_all("Bed", filters={"greenhouse": greenhouse}, fields=["bed", "bed__area", "total_variety_area", "variety"])
+        bed_data = [
+            {"bed": b["bed"], "bed__area": b["bed__area"], "total_variety_area": b["total_variety_area"], "variety": b["variety"]}
+            for b in layout.beds
+        ]
         spray_teams = frappe.get_all("Spray Team", filters={"enabled": 1}, fields=["name"])
 
         # --- 7. Final Response ---
@@ -291,8 +274,8 @@ def getScoutingData():
             "varieties":varieties_data,
             "boms": chemical_mix_boms,
             "bom_items": bom_items,
-            "custom_bed_numbering": bed_zone_numbering[0].get("custom_bed_numbering") if bed_zone_numbering else None,
-            "custom_zone_numbering": bed_zone_numbering[0].get("custom_zone_numbering") if bed_zone_numbering else None,
+            "custom_bed_numbering": layout.bed_numbering,
+            "custom_zone_numbering": layout.zone_numbering,
             "all_chemicals": all_chemicals,
             "bed_data": bed_data,
             "spray_team_team": spray_teams,
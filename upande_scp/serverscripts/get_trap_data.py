@@ -5,8 +5,10 @@ from frappe import _
 from datetime import datetime, timedelta
 import json
 
+from upande_scp.serverscripts.zone_geometry import get_map_zone_geometries
+
 @frappe.whitelist()
-def getTrapData(week):
+def getTrapData(week, zoom=None, lod=None, geometry=None):
     """
     Fetch trap monitoring data for a specific week
     Week format: 2025-W45 (year-week)
@@ -95,11 +97,9 @@ def getTrapData(week):
                     'longitude': entry.longitude
                 })
         
-        # Fetch zone GeoJSON data
-        zones_with_geojson = frappe.get_all(
-            'Zone',
-            filters={'raw_geojson': ['!=', '']},
-            fields=['name', 'raw_geojson']
+        # Fetch zone GeoJSON data at the requested level of detail
+        zones_with_geojson, geometry_bundle = get_map_zone_geometries(
+            frappe._dict(zoom=zoom, lod=lod, geometry=geometry)
         )
         
         frappe.logger().info(f"Found {len(trap_entries)} trap entries for week {week}")
@@ -109,6 +109,7 @@ def getTrapData(week):
             'greenhouses': sorted(list(greenhouses_set)),
             'pests': sorted(list(pests_set)),
             'all_zones_geojson': zones_with_geojson,
+            'geometry_bundle': geometry_bundle,
             'week': week,
             'start_date': start_date_str,
             'end_date': end_date_str,
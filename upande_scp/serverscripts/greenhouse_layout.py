@@ -0,0 +1,194 @@
+import json
+
+import frappe
+from frappe.utils import cint, flt
+
+GREENHOUSE_LAYOUT_FIELDS = [
+    "greenhouse", "bed_numbering", "zone_numbering", "bed_count", "active_bed_count",
+    "zone_count", "max_zone_count", "total_bed_area", "beds", "sectors",
+]
+
+
+def bed_sort_key(bed):
+    number = str(bed.get("bed") or "").strip()
+    return (0, int(number), bed["name"]) if number.isdigit() else (1, 0, bed["name"])
+
+
+def get_variety_sectors(greenhouse, beds):
+    """
+    Variety sectors of a greenhouse: the Bed And Zone Automation sectors when set up,
+    otherwise runs of consecutive beds planted with the same variety.
+    """
+    beds_by_number = {cint(bed["bed"]): bed for bed in beds if cint(bed["bed"])}
+    automation_sectors = frappe.get_all(
+        "Greenhouse Sectors",
+        filters={"parenttype": "Bed And Zone Automation", "parent": greenhouse},
+        fields=["sector", "from_bed", "to_bed"],
+        order_by="idx asc",
+    )
+
+    runs = []
+    if automation_sectors:
+        for sector in automation_sectors:
+            first, last = sorted((cint(sector.from_bed), cint(sector.to_bed)))
+            runs.append((sector.sector, first, last))
+    else:
+        for number in sorted(beds_by_number):
+            variety = beds_by_number[number]["variety"]
+            if runs and runs[-1][0] == variety and runs[-1][2] == number - 1:
+                runs[-1] = (variety, runs[-1][1], number)
+            else:
+                runs.append((variety, number, number))
+
+    sectors = []
+    for variety, first, last in runs:
+        sector_beds = [beds_by_number[n] for n in range(first, last + 1) if n in beds_by_number]
+        sectors.append({
+            "variety": variety,
+            "from_bed": first,
+            "to_bed": last,
+            "bed_count": len(sector_beds),
+            "area": flt(sum(flt(bed["bed__area"]) for bed in sector_beds), 3),
+        })
+    return sectors
+
+
+def build_greenhouse_layout(greenhouse):
+    """Field values of a greenhouse's Greenhouse Layout row, from a few set-based queries."""
+    numbering = frappe.db.get_value(
+        "Warehouse", greenhouse, ["custom_bed_numbering", "custom_zone_numbering"], as_dict=True
+    ) or frappe._dict()
+
+    zones_by_bed = dict(frappe.db.sql(
+        """SELECT `bed`, COUNT(*) FROM `tabZone` WHERE `greenhouse` = %s GROUP BY `bed`""",
+        greenhouse,
+    ))
+
+    beds = []
+    for bed in frappe.get_all(
+        "Bed",
+        filters={"greenhouse": greenhouse},
+        fields=["name", "bed", "custom_active", "bed__area", "total_variety_area", "variety"],
+    ):
+        beds.append({
+            "name": bed.name,
+            "bed": bed.bed,
+            "active": cint(bed.custom_active),
+            "zones": cint(zones_by_bed.get(bed.name)),
+            "bed__area": bed.bed__area,
+            "total_variety_area": bed.total_variety_area,
+            "variety": bed.variety,
+        })
+    beds.sort(key=bed_sort_key)
+
+    active_beds = [bed for bed in beds if bed["active"]]
+    return {
+        "greenhouse": greenhouse,
+        "bed_numbering": numbering.custom_bed_numbering,
+        "zone_numbering": numbering.custom_zone_numbering,
+        "bed_count": len(beds),
+        "active_bed_count": len(active_beds),
+        "zone_count": sum(bed["zones"] for bed in beds),
+        "max_zone_count": max((bed["zones"] for bed in active_beds), default=0),
+        "total_bed_area": flt(sum(flt(bed["bed__area"]) for bed in beds), 3),
+        "beds": json.dumps(beds, default=str),
+        "sectors": json.dumps(get_variety_sectors(greenhouse, beds), default=str),
+    }
+
+
+def refresh_greenhouse_layout(greenhouse):
+    """
+    Rebuilds one greenhouse's layout row and returns its field values;
+    drops the row and returns None when the greenhouse is gone.
+    """
+    if not greenhouse:
+        return None
+
+    if not frappe.db.exists("Warehouse", greenhouse):
+        frappe.db.delete("Greenhouse Layout", {"greenhouse": greenhouse})
+        return None
+
+    # After a Warehouse rename the old row points at the new name but keeps the old one
+    frappe.db.delete("Greenhouse Layout", {"greenhouse": greenhouse, "name": ["!=", greenhouse]})
+
+    values = build_greenhouse_layout(greenhouse)
+    if frappe.db.exists("Greenhouse Layout", greenhouse):
+        frappe.db.set_value("Greenhouse Layout", greenhouse, values)
+    else:
+        try:
+            frappe.get_doc({"doctype": "Greenhouse Layout", **values}).insert(ignore_permissions=True)
+        except frappe.DuplicateEntryError:
+            # Another request or the rebuild job inserted it since the exists check
+            frappe.db.set_value("Greenhouse Layout", greenhouse, values)
+    return values
+
+
+def refresh_greenhouse_layouts(greenhouses):
+    """Background job: rebuilds the layout rows of the greenhouses changed in one transaction."""
+    for greenhouse in greenhouses:
+        refresh_greenhouse_layout(greenhouse)
+
+
+def enqueue_greenhouse_layouts():
+    """after_commit callback: queues one rebuild for every greenhouse marked dirty in the transaction."""
+    greenhouses = frappe.flags.pop("dirty_greenhouse_layouts", None)
+    if greenhouses:
+        frappe.enqueue(
+            "upande_scp.serverscripts.greenhouse_layout.refresh_greenhouse_layouts",
+            queue="short",
+            greenhouses=sorted(greenhouses),
+        )
+
+
+def discard_greenhouse_layouts():
+    frappe.flags.pop("dirty_greenhouse_layouts", None)
+
+
+def get_greenhouse_layout(greenhouse):
+    """
+    A greenhouse's layout summary with beds and sectors parsed, read by primary key.
+    Built on the spot the first time a greenhouse is asked for.
+    """
+    layout = frappe.db.get_value("Greenhouse Layout", greenhouse, GREENHOUSE_LAYOUT_FIELDS, as_dict=True)
+    if not layout:
+        # Use the built values: a row a concurrent request committed may not be visible to a re-read
+        values = refresh_greenhouse_layout(greenhouse)
+        if not values:
+            return None
+        layout = frappe._dict(values)
+
+    layout.beds = json.loads(layout.beds or "[]")
+    layout.sectors = json.loads(layout.sectors or "[]")
+    return layout
+
+
+def on_layout_change(doc, method=None, *args):
+    """
+    doc_events handler for Bed, Zone, Warehouse and Bed And Zone Automation: marks the
+    greenhouse the document belongs to (and the one it left) dirty. Each dirty greenhouse is
+    rebuilt once, in a job queued after commit, however many of its beds and zones were saved.
+    """
+    if doc.doctype == "Warehouse":
+        if doc.get("warehouse_type") != "Greenhouse":
+            return
+        if method == "on_trash":
+            # Drop the row first so its link does not block the delete
+            frappe.db.delete("Greenhouse Layout", {"greenhouse": doc.name})
+            return
+        greenhouses = {doc.name}
+    else:
+        greenhouses = {doc.get("greenhouse") or doc.name}
+
+    if doc.doctype == "Warehouse" and method == "after_rename" and args:
+        # args are (old name, new name, merge)
+        greenhouses.add(args[0])
+
+    previous = doc.get_doc_before_save() if method == "on_update" else None
+    if previous and previous.get("greenhouse"):
+        greenhouses.add(previous.greenhouse)
+
+    if frappe.flags.dirty_greenhouse_layouts is None:
+        frappe.flags.dirty_greenhouse_layouts = set()
+        frappe.db.after_commit.add(enqueue_greenhouse_layouts)
+        frappe.db.after_rollback.add(discard_greenhouse_layouts)
+    frappe.flags.dirty_greenhouse_layouts.update(greenhouses)
@@ -0,0 +1,217 @@
+import json
+
+import frappe
+import numpy as np
+import shapely
+from shapely.geometry import shape
+from shapely.strtree import STRtree
+
+from upande_scp.serverscripts.zone_index import get_zone_index, zone_buffer, zone_confidence
+
+GREENHOUSE_INDEX_CACHE_KEY = "upande_scp:greenhouse_index"
+GREENHOUSE_INDEX_VERSION_KEY = "upande_scp:greenhouse_index_version"
+
+# Rough metres per degree, only used to turn a GPS accuracy into a search radius
+METRES_PER_DEGREE = 111320.0
+
+# (version, GreenhouseIndex) loaded by this worker
+_local_index = None
+
+
+def parse_greenhouse_outline(raw_geojson):
+    """Merges the polygon features of a Warehouse's custom_raw_geojson into one geometry."""
+    if not raw_geojson:
+        return None
+
+    geojson = json.loads(raw_geojson)
+    if not isinstance(geojson, dict) or not geojson.get("features"):
+        return None
+
+    polygons = [
+        shape(feature["geometry"])
+        for feature in geojson["features"]
+        if (feature.get("geometry") or {}).get("type") in ("Polygon", "MultiPolygon")
+    ]
+    if not polygons:
+        return None
+
+    return shapely.union_all(polygons)
+
+
+class GreenhouseIndex:
+    """STRtree over the WGS84 outlines of every greenhouse."""
+
+    def __init__(self, names, outlines):
+        self.names = list(names)
+        self.outlines = np.asarray(outlines, dtype=object)
+        self.tree = STRtree(self.outlines)
+
+    def __len__(self):
+        return len(self.names)
+
+    def locate(self, latitudes, longitudes, tolerance_m=0.0):
+        """
+        Returns the greenhouse containing each point, or None.
+        Points outside every outline fall back to the nearest one within tolerance_m,
+        a single distance or one per point.
+        """
+        located = np.full(len(latitudes), None, dtype=object)
+        if not len(self) or not len(latitudes):
+            return located
+
+        points = shapely.points(np.asarray(longitudes, dtype=float), np.asarray(latitudes, dtype=float))
+        names = np.asarray(self.names, dtype=object)
+
+        input_rows, tree_rows = self.tree.query(points, predicate="within")
+        # Keep the first outline when outlines overlap
+        for input_row, tree_row in sorted(zip(input_rows, tree_rows, strict=True), reverse=True):
+            located[input_row] = names[tree_row]
+
+        tolerances = np.broadcast_to(np.asarray(tolerance_m, dtype=float), (len(latitudes),))
+        outside = np.asarray(
+            [row for row, name in enumerate(located) if name is None and tolerances[row] > 0], dtype=int
+        )
+        if len(outside):
+            (input_rows, tree_rows), distances = self.tree.query_nearest(
+                points[outside],
+                max_distance=float(tolerances[outside].max()) / METRES_PER_DEGREE,
+                return_distance=True,
+                all_matches=False,
+            )
+            # Each point only takes an outline within its own tolerance
+            near = distances <= tolerances[outside[input_rows]] / METRES_PER_DEGREE
+            located[outside[input_rows[near]]] = names[tree_rows[near]]
+
+        return located
+
+    def to_cache(self):
+        return {"names": self.names, "wkb": [bytes(w) for w in shapely.to_wkb(self.outlines)]}
+
+    @classmethod
+    def from_cache(cls, payload):
+        return cls(payload["names"], shapely.from_wkb(payload["wkb"]))
+
+
+def build_greenhouse_index():
+    warehouses = frappe.get_all(
+        "Warehouse",
+        filters={"warehouse_type": "Greenhouse", "disabled": 0, "custom_raw_geojson": ["is", "set"]},
+        fields=["name", "custom_raw_geojson"],
+        order_by="name asc"
+    )
+
+    names = []
+    outlines = []
+    for wh in warehouses:
+        try:
+            outline = parse_greenhouse_outline(wh.custom_raw_geojson)
+        except Exception as e:
+            frappe.log_error(title=f"Invalid GeoJSON in {wh.name}", message=str(e))
+            continue
+
+        if outline is not None and not outline.is_empty:
+            names.append(wh.name)
+            outlines.append(outline)
+
+    return GreenhouseIndex(names, outlines)
+
+
+def get_greenhouse_index():
+    """Returns the greenhouse outline index from this worker, Redis, or the database."""
+    global _local_index
+    cache = frappe.cache()
+
+    version = cache.get_value(GREENHOUSE_INDEX_VERSION_KEY)
+    if version is None:
+        version = frappe.generate_hash(length=10)
+        cache.set_value(GREENHOUSE_INDEX_VERSION_KEY, version)
+
+    if _local_index and _local_index[0] == version:
+        return _local_index[1]
+
+    payload = cache.get_value(GREENHOUSE_INDEX_CACHE_KEY)
+    if payload and payload.get("version") == version:
+        index = GreenhouseIndex.from_cache(payload)
+    else:
+        index = build_greenhouse_index()
+        cache.set_value(GREENHOUSE_INDEX_CACHE_KEY, {**index.to_cache(), "version": version})
+
+    _local_index = (version, index)
+    return index
+
+
+def bump_greenhouse_index_version():
+    global _local_index
+    cache = frappe.cache()
+    cache.delete_value(GREENHOUSE_INDEX_CACHE_KEY)
+    cache.set_value(GREENHOUSE_INDEX_VERSION_KEY, frappe.generate_hash(length=10))
+    _local_index = None
+
+
+def invalidate_greenhouse_index(doc=None, method=None, *args):
+    """
+    doc_events handler for Warehouse: outlines are reloaded on next lookup.
+    The version moves again after commit, so outlines a lookup cached from the old rows
+    in between are dropped.
+    """
+    if doc is not None and doc.get("warehouse_type") != "Greenhouse":
+        # A warehouse that stopped being a greenhouse still has to leave the index
+        previous = doc.get_doc_before_save() if method == "on_update" else None
+        if not previous or previous.get("warehouse_type") != "Greenhouse":
+            return
+
+    bump_greenhouse_index_version()
+    if not frappe.flags.greenhouse_index_pending:
+        frappe.flags.greenhouse_index_pending = True
+        frappe.db.after_commit.add(bump_pending_greenhouse_index)
+        frappe.db.after_rollback.add(bump_pending_greenhouse_index)
+
+
+def bump_pending_greenhouse_index():
+    if frappe.flags.pop("greenhouse_index_pending", None):
+        bump_greenhouse_index_version()
+
+
+def locate_greenhouses(latitudes, longitudes, accuracies=None):
+    """Point-in-polygon greenhouse lookup for many points; each point's accuracy widens its edge tolerance."""
+    tolerance_m = 0.0
+    if accuracies is not None and len(accuracies):
+        tolerance_m = zone_buffer(np.asarray(accuracies, dtype=float))
+
+    return get_greenhouse_index().locate(latitudes, longitudes, tolerance_m=tolerance_m)
+
+
+def locate_point(latitude, longitude, accuracy=None, greenhouse=None):
+    """
+    Resolves greenhouse, bed and zone for a bare coordinate.
+    The containing greenhouse is found first, then only its zones are searched.
+    """
+    lat = float(latitude)
+    lon = float(longitude)
+    accuracy_m = float(accuracy) if accuracy else 5.0
+
+    located = locate_greenhouses([lat], [lon], [accuracy_m])[0]
+    result = {
+        "greenhouse": located or greenhouse,
+        "greenhouse_from_outline": bool(located),
+        "bed": None,
+        "zone": None,
+        "confidence": 0.0,
+        "distance": None,
+    }
+
+    if not result["greenhouse"]:
+        return result
+
+    zone_index = get_zone_index(result["greenhouse"])
+    if not len(zone_index):
+        return result
+
+    zone, distance = zone_index.nearest(zone_index.project(lat, lon))
+    if zone:
+        result["zone"] = zone
+        result["bed"] = zone_index.beds[zone_index.names.index(zone)]
+        result["distance"] = round(distance, 1)
+        result["confidence"] = zone_confidence(distance, accuracy_m, zone_buffer(accuracy_m))
+
+    return result
@@ -0,0 +1,370 @@
+import frappe
+import numpy as np
+from frappe import _
+from frappe.utils import date_diff, getdate
+
+from upande_scp.serverscripts.greenhouse_layout import get_greenhouse_layout
+from upande_scp.serverscripts.observation_catalog import get_observation_catalog
+
+# observation type -> (child table, parentfield, observation link field, has stage, has count)
+OBSERVATION_TABLES = {
+    "pests": ("Pests Scouting Entry", "pests_scouting_entry", "pest", True, True),
+    "diseases": ("Diseases Scouting Entry", "diseases_scouting_entry", "disease", True, False),
+    "predators": ("Predators Scouting Entry", "predators_scouting_entry", "predator", True, True),
+    "weeds": ("Weeds Scouting Entry", "weeds_scouting_entry", "weed", False, False),
+    "incidents": ("Incidents Scouting Entry", "incidents_scouting_entry", "incident", False, False),
+    "physiological_disorders": (
+        "Physiological Disorders Entry", "physiological_disorders_entry", "physiological_disorders", False, False
+    ),
+}
+
+# Stage recorded for observations without one
+DEFAULT_STAGE = "Present"
+
+# Longest date range getHeatmapTimelapse serves in one call
+MAX_TIMELAPSE_DAYS = 92
+
+# Legend colour per observation type when the master record has none
+HEATMAP_DEFAULT_COLORS = {
+    "pests": "#999999",
+    "diseases": "#999999",
+    "predators": "#4c6ef5",
+    "weeds": "#51cf66",
+    "incidents": "#868e96",
+    "physiological_disorders": "#ff6b6b",
+}
+
+
+def get_observation_rows(from_date, greenhouse, to_date=None):
+    """
+    Observation totals of a greenhouse from from_date to to_date (only from_date when
+    to_date is not given), read from the Scouting Rollup rather than the raw child rows:
+    (date, observation_type, observation, stage, count, bed number, zone number).
+    A row with no count counts once, as the rollup already sums it.
+    """
+    return frappe.db.sql(
+        """SELECT r.`date`, r.`observation_type`, r.`observation`, r.`stage`, r.`count`, b.`bed`, z.`zone`
+        FROM `tabScouting Rollup` r
+        JOIN `tabZone` z ON z.`name` = r.`zone`
+        JOIN `tabBed` b ON b.`name` = z.`bed`
+        WHERE r.`date` BETWEEN %(from_date)s AND %(to_date)s
+            AND r.`greenhouse` = %(greenhouse)s AND r.`observation_type` IN %(observation_types)s""",
+        {
+            "from_date": from_date,
+            "to_date": to_date or from_date,
+            "greenhouse": greenhouse,
+            "observation_types": tuple(OBSERVATION_TABLES),
+        },
+    )
+
+
+def get_grid_size(greenhouse):
+    """(active bed count, most zones on one active bed) from the greenhouse layout."""
+    layout = get_greenhouse_layout(greenhouse)
+    if not layout:
+        return 0, 0
+    return layout.active_bed_count, layout.max_zone_count
+
+
+def encode(values):
+    """Dictionary-encodes a sequence: (sorted unique values as str, int32 code per value)."""
+    # Look up the (few) distinct values by hash and sort only those, not every row
+    distinct = list(dict.fromkeys(values))
+    dictionary = sorted({str(value) for value in distinct})
+    position = {label: i for i, label in enumerate(dictionary)}
+    codes = {value: position[str(value)] for value in distinct}
+    return dictionary, np.fromiter(map(codes.__getitem__, values), dtype=np.int32, count=len(values))
+
+
+def to_numbers(values):
+    """Bed or zone numbers as an int64 array, 0 where a value is not a plain number."""
+    numbers = {value: int(value) if str(value).strip().isdigit() else 0 for value in set(values)}
+    return np.fromiter(map(numbers.__getitem__, values), dtype=np.int64, count=len(values))
+
+
+def compact(array):
+    """Plain lists for the response, as ints when every value is whole."""
+    if np.array_equal(array, np.round(array)):
+        return array.astype(np.int64).tolist()
+    return np.round(array, 2).tolist()
+
+
+def encode_observation_rows(rows, bed_count, zone_count):
+    """
+    Dictionary-encodes observation rows for the grid builders, dropping rows whose bed or
+    zone is not numbered. Observations are keyed by (type, name). Returns None when no row
+    can be placed, else the grid size, the type/name/stage dictionaries, the observation keys
+    and per row its date, observation code, stage code, flat cell index and value.
+    """
+    if not rows:
+        return None
+
+    dates, types, names, stages, values, beds, zones = zip(*rows, strict=True)
+    beds, zones = to_numbers(beds), to_numbers(zones)
+
+    # Zones whose bed or zone is not numbered cannot be placed on the grid
+    placed = np.flatnonzero((beds > 0) & (zones > 0))
+    if not len(placed):
+        return None
+    beds, zones = beds[placed], zones[placed]
+    placed_rows = placed.tolist()
+    bed_count = max(bed_count, int(beds.max()))
+    zone_count = max(zone_count, int(zones.max()))
+
+    # Types keep the OBSERVATION_TABLES order so the page lists pests first
+    type_names = list(OBSERVATION_TABLES)
+    type_position = {observation_type: i for i, observation_type in enumerate(type_names)}
+    type_codes = np.fromiter(
+        (type_position[types[i]] for i in placed_rows), dtype=np.int64, count=len(placed_rows)
+    )
+    name_names, name_codes = encode([names[i] for i in placed_rows])
+    observation_ids, observation_codes = np.unique(
+        type_codes * len(name_names) + name_codes, return_inverse=True
+    )
+    observation_keys = np.column_stack(np.divmod(observation_ids, len(name_names)))
+    stage_names, stage_codes = encode([stages[i] or DEFAULT_STAGE for i in placed_rows])
+
+    return frappe._dict(
+        bed_count=bed_count,
+        zone_count=zone_count,
+        type_names=type_names,
+        name_names=name_names,
+        stage_names=stage_names,
+        observation_keys=observation_keys,
+        dates=[dates[i] for i in placed_rows],
+        observation_codes=observation_codes.ravel(),
+        stage_codes=stage_codes,
+        cell_indexes=(beds - 1) * zone_count + (zones - 1),
+        row_values=np.asarray(values, dtype=np.float64)[placed],
+    )
+
+
+def empty_grid(bed_count, zone_count):
+    return {
+        "bed_count": bed_count, "zone_count": zone_count, "types": [], "names": [], "stages": [],
+        "observations": {"type": [], "name": [], "total": [], "max": []},
+    }
+
+
+def build_heatmap_grid(rows, bed_count, zone_count):
+    """
+    Dense bed x zone count matrices, one per observation, plus per-stage totals.
+    Observations are keyed by (type, name) and only those with a non-zero total are returned.
+    Cell (bed b, zone z) of an observation is cells[i][(b - 1) * zone_count + (z - 1)].
+    """
+    encoded = encode_observation_rows(rows, bed_count, zone_count)
+    if not encoded:
+        return {
+            **empty_grid(bed_count, zone_count),
+            "cells": [], "stage_counts": {"observation": [], "stage": [], "count": []},
+        }
+
+    observation_keys = encoded.observation_keys
+    cells = np.zeros((len(observation_keys), encoded.bed_count * encoded.zone_count), dtype=np.float64)
+    np.add.at(cells, (encoded.observation_codes, encoded.cell_indexes), encoded.row_values)
+
+    stage_totals = np.zeros((len(observation_keys), len(encoded.stage_names)), dtype=np.float64)
+    np.add.at(stage_totals, (encoded.observation_codes, encoded.stage_codes), encoded.row_values)
+
+    totals = cells.sum(axis=1)
+    shown = np.flatnonzero(totals > 0)
+    stage_observations, stage_indexes = np.nonzero(stage_totals[shown])
+
+    return {
+        "bed_count": encoded.bed_count,
+        "zone_count": encoded.zone_count,
+        "types": encoded.type_names,
+        "names": encoded.name_names,
+        "stages": encoded.stage_names,
+        "observations": {
+            "type": observation_keys[shown, 0].tolist(),
+            "name": observation_keys[shown, 1].tolist(),
+            "total": compact(totals[shown]),
+            "max": compact(cells[shown].max(axis=1)),
+        },
+        "cells": [compact(row) for row in cells[shown]],
+        "stage_counts": {
+            "observation": stage_observations.tolist(),
+            "stage": stage_indexes.tolist(),
+            "count": compact(stage_totals[shown][stage_observations, stage_indexes]),
+        },
+    }
+
+
+def diff_frames(previous_keys, previous_counts, keys, counts):
+    """(keys, deltas) of the sparse cells that differ between two sorted sparse frames."""
+    union = np.union1d(previous_keys, keys)
+    delta = np.zeros(len(union), dtype=np.float64)
+    delta[np.searchsorted(union, keys)] += counts
+    delta[np.searchsorted(union, previous_keys)] -= previous_counts
+    changed = np.flatnonzero(delta)
+    return union[changed], delta[changed]
+
+
+def build_heatmap_timelapse(rows, bed_count, zone_count):
+    """
+    Day-by-day bed x zone heatmaps of a date range as a base frame plus sparse changes.
+    dates lists the scouted days in order; base holds the non-zero cells of dates[0] and
+    deltas[i] the cells whose count changed from dates[i] to dates[i + 1], as columnar
+    (observation, cell, delta). Cells are indexed as in build_heatmap_grid.
+    Counts are summed per (day, observation, cell) key and consecutive days diffed on
+    those keys, so the days x observations x cells cube is never materialised.
+    """
+    encoded = encode_observation_rows(rows, bed_count, zone_count)
+    if not encoded:
+        return {
+            **empty_grid(bed_count, zone_count), "dates": [],
+            "base": {"observation": [], "cell": [], "count": []}, "deltas": [],
+            "daily_totals": {"date": [], "observation": [], "count": []},
+        }
+
+    observation_keys = encoded.observation_keys
+    cell_count = encoded.bed_count * encoded.zone_count
+    frame_size = len(observation_keys) * cell_count
+    dates, day_codes = encode(encoded.dates)
+
+    # np.unique sorts the keys by day, then observation, then cell
+    keys, inverse = np.unique(
+        day_codes.astype(np.int64) * frame_size
+        + encoded.observation_codes.astype(np.int64) * cell_count
+        + encoded.cell_indexes,
+        return_inverse=True,
+    )
+    counts = np.bincount(inverse.ravel(), weights=encoded.row_values)
+    days, keys = np.divmod(keys, frame_size)
+    observations = keys // cell_count
+    bounds = np.searchsorted(days, np.arange(len(dates) + 1))
+
+    totals = np.bincount(observations, weights=counts, minlength=len(observation_keys))
+    peaks = np.zeros(len(observation_keys), dtype=np.float64)
+    np.maximum.at(peaks, observations, counts)
+
+    daily_totals = np.zeros((len(dates), len(observation_keys)), dtype=np.float64)
+    np.add.at(daily_totals, (days, observations), counts)
+    total_days, total_observations = np.nonzero(daily_totals)
+
+    deltas = []
+    for day in range(1, len(dates)):
+        previous = slice(bounds[day - 1], bounds[day])
+        current = slice(bounds[day], bounds[day + 1])
+        changed, delta = diff_frames(keys[previous], counts[previous], keys[current], counts[current])
+        deltas.append({
+            "observation": (changed // cell_count).tolist(),
+            "cell": (changed % cell_count).tolist(),
+            "delta": compact(delta),
+        })
+
+    base = slice(bounds[0], bounds[1])
+    return {
+        "bed_count": encoded.bed_count,
+        "zone_count": encoded.zone_count,
+        "types": encoded.type_names,
+        "names": encoded.name_names,
+        "stages": encoded.stage_names,
+        "observations": {
+            "type": observation_keys[:, 0].tolist(),
+            "name": observation_keys[:, 1].tolist(),
+            "total": compact(totals),
+            "max": compact(peaks),
+        },
+        "dates": dates,
+        "base": {
+            "observation": observations[base].tolist(),
+            "cell": (keys[base] % cell_count).tolist(),
+            "count": compact(counts[base]),
+        },
+        "deltas": deltas,
+        "daily_totals": {
+            "date": total_days.tolist(),
+            "observation": total_observations.tolist(),
+            "count": compact(daily_totals[total_days, total_observations]),
+        },
+    }
+
+
+def get_observation_types(names_by_type=None):
+    """
+    Legend colour and stages per observation, keyed like getHeatmapData's observation_types.
+    Limited to names_by_type ({type: [names]}) when given; read from the catalog cache.
+    """
+    catalog = get_observation_catalog()
+    observation_types = {}
+    for observation_type, default_color in HEATMAP_DEFAULT_COLORS.items():
+        records = catalog[observation_type]
+        names = records if names_by_type is None else names_by_type.get(observation_type, [])
+
+        observation_types[observation_type] = {}
+        for name in names:
+            record = records.get(name)
+            if not record:
+                continue
+            observation_types[observation_type][record["name"]] = {
+                "color": record["color"] or default_color,
+                "stages": [
+                    {
+                        "stage": stage["stage"],
+                        "symbol": stage.get("symbol") or "",
+                        "reading_type": stage["reading_type"],
+                    }
+                    for stage in record["stages"]
+                ],
+            }
+
+    return observation_types
+
+
+def get_grid_observation_names(grid):
+    """{type: [names]} of the observations shown in a heatmap grid."""
+    names_by_type = {}
+    for type_code, name_code in zip(grid["observations"]["type"], grid["observations"]["name"], strict=True):
+        names_by_type.setdefault(grid["types"][type_code], []).append(grid["names"][name_code])
+    return names_by_type
+
+
+@frappe.whitelist()
+def getHeatmapGrid(date, greenhouse):
+    """
+    Bed x zone heatmaps of a greenhouse for one day, computed server-side.
+    Observation types, names and stages are dictionary-encoded; observations are columnar
+    and cells holds one flat bed-major count array per observation.
+    """
+    try:
+        bed_count, zone_count = get_grid_size(greenhouse)
+        grid = build_heatmap_grid(get_observation_rows(date, greenhouse), bed_count, zone_count)
+        grid["observation_types"] = get_observation_types(get_grid_observation_names(grid))
+        grid["date"] = date
+        grid["greenhouse"] = greenhouse
+        return grid
+
+    except Exception as e:
+        frappe.log_error(frappe.get_traceback(), "Get Heatmap Grid Error")
+        frappe.throw(_("Error fetching heatmap data: {0}").format(str(e)))
+
+
+@frappe.whitelist()
+def getHeatmapTimelapse(from_date, to_date, greenhouse):
+    """
+    Bed x zone heatmaps of a greenhouse for every scouted day in a date range, from one query.
+    Encoded like getHeatmapGrid, but cells come as a sparse base frame for the first day and
+    one sparse delta frame per following day, ready to be replayed as an animation.
+    """
+    from_date, to_date = getdate(from_date), getdate(to_date)
+    if from_date > to_date:
+        frappe.throw(_("From Date must be before To Date."))
+    if date_diff(to_date, from_date) >= MAX_TIMELAPSE_DAYS:
+        frappe.throw(_("A heatmap time-lapse covers at most {0} days.").format(MAX_TIMELAPSE_DAYS))
+
+    try:
+        bed_count, zone_count = get_grid_size(greenhouse)
+        timelapse = build_heatmap_timelapse(
+            get_observation_rows(from_date, greenhouse, to_date), bed_count, zone_count
+        )
+        timelapse["observation_types"] = get_observation_types(get_grid_observation_names(timelapse))
+        timelapse["from_date"] = str(from_date)
+        timelapse["to_date"] = str(to_date)
+        timelapse["greenhouse"] = greenhouse
+        return timelapse
+
+    except Exception as e:
+        frappe.log_error(frappe.get_traceback(), "Get Heatmap Timelapse Error")
+        frappe.throw(_("Error fetching heatmap data: {0}").format(str(e)))
@@ -0,0 +1,351 @@
+import math
+import re
+
+import frappe
+import mapbox_vector_tile
+import numpy as np
+import shapely
+from frappe.website.page_renderers.base_renderer import BaseRenderer
+from shapely.geometry import box
+from shapely.strtree import STRtree
+from werkzeug.wrappers import Response
+
+from upande_scp.serverscripts.greenhouse_locator import get_greenhouse_index
+from upande_scp.serverscripts.zone_index import parse_zone_line
+
+MAP_LAYERS_CACHE_KEY = "upande_scp:map_layers"
+MAP_TILE_CACHE_KEY = "upande_scp:map_tiles"
+MAP_GEOMETRY_VERSION_KEY = "upande_scp:map_geometry_version"
+
+TILE_EXTENT = 4096
+# Geometry kept around each tile (in tile units) so lines do not break at tile edges
+TILE_BUFFER = 64
+MAX_TILE_ZOOM = 22
+# Only tiles at these zooms over the farm are cached; anything else is rendered per request
+PREGENERATE_ZOOMS = range(14, 19)
+TILE_CACHE_SECONDS = 7 * 24 * 3600
+# Website route the map pages load tiles from: /tiles/{z}/{x}/{y}.mvt
+TILE_ROUTE = re.compile(r"tiles/(\d+)/(\d+)/(\d+)\.mvt")
+
+WEB_MERCATOR_RADIUS = 6378137.0
+WEB_MERCATOR_HALF_WORLD = math.pi * WEB_MERCATOR_RADIUS
+
+# (version, layers) loaded by this worker
+_local_layers = None
+
+
+def lonlat_to_mercator(lons, lats):
+    lons = np.asarray(lons, dtype=float)
+    lats = np.clip(np.asarray(lats, dtype=float), -85.05112878, 85.05112878)
+    x = WEB_MERCATOR_RADIUS * np.radians(lons)
+    y = WEB_MERCATOR_RADIUS * np.log(np.tan(np.pi / 4 + np.radians(lats) / 2))
+    return x, y
+
+
+def to_mercator(geometries):
+    return shapely.transform(
+        geometries,
+        lambda coords: np.column_stack(lonlat_to_mercator(coords[:, 0], coords[:, 1])),
+    )
+
+
+def tile_bounds(z, x, y):
+    """Web Mercator bounds (minx, miny, maxx, maxy) of an XYZ tile."""
+    size = 2 * WEB_MERCATOR_HALF_WORLD / (2**z)
+    min_x = -WEB_MERCATOR_HALF_WORLD + x * size
+    max_y = WEB_MERCATOR_HALF_WORLD - y * size
+    return min_x, max_y - size, min_x + size, max_y
+
+
+def mercator_to_tile(mx, my, z):
+    size = 2 * WEB_MERCATOR_HALF_WORLD / (2**z)
+    return int((mx + WEB_MERCATOR_HALF_WORLD) // size), int((WEB_MERCATOR_HALF_WORLD - my) // size)
+
+
+class TileLayer:
+    """One MVT layer: Web Mercator geometries, their properties and an STRtree."""
+
+    def __init__(self, name, geometries, properties):
+        self.name = name
+        self.geometries = np.asarray(geometries, dtype=object)
+        self.properties = list(properties)
+        self.tree = STRtree(self.geometries)
+
+    def features(self, bounds, simplify_tolerance):
+        positions = sorted(self.tree.query(box(*bounds)))
+        if not positions:
+            return []
+
+        geometries = shapely.simplify(self.geometries[positions], simplify_tolerance, preserve_topology=True)
+        geometries = shapely.clip_by_rect(geometries, *bounds)
+        return [
+            {"geometry": geometry, "properties": self.properties[position]}
+            for position, geometry in zip(positions, geometries, strict=True)
+            if not geometry.is_empty
+        ]
+
+    def to_cache(self):
+        return {
+            "name": self.name,
+            "properties": self.properties,
+            "wkb": [bytes(w) for w in shapely.to_wkb(self.geometries)],
+        }
+
+    @classmethod
+    def from_cache(cls, payload):
+        return cls(payload["name"], shapely.from_wkb(payload["wkb"]), payload["properties"])
+
+
+def build_map_layers():
+    """Greenhouse outlines, beds and zones in Web Mercator, ready to be cut into tiles."""
+    bed_records = {
+        b.name: b for b in frappe.get_all("Bed", fields=["name", "bed", "greenhouse", "variety"])
+    }
+    zones = frappe.get_all(
+        "Zone",
+        filters={"raw_geojson": ["is", "set"]},
+        fields=["name", "greenhouse", "bed", "zone", "raw_geojson"],
+        order_by="name asc"
+    )
+
+    zone_geometries = []
+    zone_properties = []
+    lines_by_bed = {}
+    for zone in zones:
+        try:
+            coords = parse_zone_line(zone.raw_geojson)
+        except Exception as e:
+            frappe.log_error(f"Error processing zone {zone.name}", str(e))
+            continue
+        if not coords:
+            continue
+
+        line = shapely.linestrings(coords)
+        bed = bed_records.get(zone.bed) or frappe._dict()
+        zone_geometries.append(line)
+        zone_properties.append({
+            "name": zone.name,
+            "greenhouse": zone.greenhouse or "",
+            "bed": zone.bed or "",
+            "zone": zone.zone or "",
+            "variety": bed.variety or "",
+        })
+        if zone.bed:
+            lines_by_bed.setdefault(zone.bed, []).append(line)
+
+    bed_geometries = []
+    bed_properties = []
+    for bed_name, lines in lines_by_bed.items():
+        bed = bed_records.get(bed_name) or frappe._dict()
+        bed_geometries.append(shapely.line_merge(shapely.union_all(lines)))
+        bed_properties.append({
+            "name": bed_name,
+            "greenhouse": bed.greenhouse or "",
+            "bed": bed.bed or "",
+            "variety": bed.variety or "",
+        })
+
+    greenhouse_index = get_greenhouse_index()
+
+    return [
+        TileLayer(
+            "greenhouses",
+            to_mercator(greenhouse_index.outlines),
+            [{"name": name} for name in greenhouse_index.names],
+        ),
+        TileLayer("beds", to_mercator(np.asarray(bed_geometries, dtype=object)), bed_properties),
+        TileLayer("zones", to_mercator(np.asarray(zone_geometries, dtype=object)), zone_properties),
+    ]
+
+
+def get_map_geometry_version():
+    cache = frappe.cache()
+    version = cache.get_value(MAP_GEOMETRY_VERSION_KEY)
+    if version is None:
+        version = frappe.generate_hash(length=10)
+        cache.set_value(MAP_GEOMETRY_VERSION_KEY, version)
+    return version
+
+
+def get_map_layers():
+    """Returns the tile layers from this worker, Redis, or the database."""
+    global _local_layers
+    cache = frappe.cache()
+    version = get_map_geometry_version()
+
+    if _local_layers and _local_layers[0] == version:
+        return _local_layers[1]
+
+    payload = cache.get_value(MAP_LAYERS_CACHE_KEY)
+    if payload and payload.get("version") == version:
+        layers = [TileLayer.from_cache(layer) for layer in payload["layers"]]
+    else:
+        layers = build_map_layers()
+        cache.set_value(MAP_LAYERS_CACHE_KEY, {
+            "version": version,
+            "layers": [layer.to_cache() for layer in layers],
+        })
+
+    _local_layers = (version, layers)
+    return layers
+
+
+def render_tile(z, x, y, layers):
+    """Encodes one XYZ tile; returns empty bytes when no geometry falls inside it."""
+    min_x, min_y, max_x, max_y = tile_bounds(z, x, y)
+    unit = (max_x - min_x) / TILE_EXTENT
+    buffered = (
+        min_x - TILE_BUFFER * unit,
+        min_y - TILE_BUFFER * unit,
+        max_x + TILE_BUFFER * unit,
+        max_y + TILE_BUFFER * unit,
+    )
+
+    encoded_layers = []
+    for layer in layers:
+        features = layer.features(buffered, simplify_tolerance=unit / 2)
+        if features:
+            encoded_layers.append({"name": layer.name, "features": features})
+
+    if not encoded_layers:
+        return b""
+
+    return mapbox_vector_tile.encode(
+        encoded_layers,
+        default_options={
+            "quantize_bounds": (min_x, min_y, max_x, max_y),
+            "extents": TILE_EXTENT,
+        },
+    )
+
+
+def get_farm_tile_range(layers, z):
+    """(first x, first y, last x, last y) of the tiles covering every map geometry at zoom z, or None."""
+    geometries = [g for layer in layers for g in layer.geometries]
+    if not geometries:
+        return None
+
+    min_x, min_y, max_x, max_y = shapely.total_bounds(np.asarray(geometries, dtype=object))
+    return (*mercator_to_tile(min_x, max_y, z), *mercator_to_tile(max_x, min_y, z))
+
+
+def is_cacheable_tile(z, x, y, layers):
+    if z not in PREGENERATE_ZOOMS:
+        return False
+    tile_range = get_farm_tile_range(layers, z)
+    return bool(tile_range) and tile_range[0] <= x <= tile_range[2] and tile_range[1] <= y <= tile_range[3]
+
+
+def get_tile(z, x, y):
+    """
+    Returns a tile from the Redis tile cache, rendering it on a miss. Only non-empty tiles over
+    the farm at PREGENERATE_ZOOMS are stored, each under its own expiring key.
+    """
+    cache = frappe.cache()
+    version = get_map_geometry_version()
+    key = f"{MAP_TILE_CACHE_KEY}:{version}:{z}/{x}/{y}"
+
+    tile = cache.get_value(key)
+    if tile is None:
+        layers = get_map_layers()
+        tile = render_tile(z, x, y, layers)
+        if tile and is_cacheable_tile(z, x, y, layers):
+            cache.set_value(key, tile, expires_in_sec=TILE_CACHE_SECONDS)
+
+    return version, tile
+
+
+def get_tile_response(z, x, y):
+    z, x, y = int(z), int(x), int(y)
+    if not (0 <= z <= MAX_TILE_ZOOM and 0 <= x < 2**z and 0 <= y < 2**z):
+        frappe.throw("Invalid tile coordinates.")
+
+    version, tile = get_tile(z, x, y)
+    etag = f'"{version}-{z}-{x}-{y}"'
+
+    if frappe.request and frappe.request.headers.get("If-None-Match") == etag:
+        return Response(status=304, headers={"ETag": etag})
+
+    return Response(
+        tile,
+        mimetype="application/vnd.mapbox-vector-tile",
+        headers={"ETag": etag, "Cache-Control": "private, max-age=3600"},
+    )
+
+
+@frappe.whitelist()
+def getTile(z, x, y):
+    """
+    Mapbox Vector Tile with the layers "greenhouses", "beds" and "zones".
+    The map pages load the same tiles from the /tiles/{z}/{x}/{y}.mvt route (MapTileRenderer).
+    """
+    return get_tile_response(z, x, y)
+
+
+class MapTileRenderer(BaseRenderer):
+    """
+    page_renderer for /tiles/{z}/{x}/{y}.mvt, for logged-in users.
+    The zone and bed layers of the map pages stay GeoJSON: they carry per-zone tooltips, clicks
+    and colours joined from the day's entries, which tile layers do not offer. They come from
+    the hashed, browser-cached geometry bundle at a zoom-dependent level of detail instead.
+    """
+
+    def can_render(self):
+        return bool(TILE_ROUTE.fullmatch(self.path or ""))
+
+    def render(self):
+        if frappe.session.user == "Guest":
+            return Response(status=403)
+        return get_tile_response(*TILE_ROUTE.fullmatch(self.path).groups())
+
+
+def pregenerate_tiles(zooms=None):
+    """Background job: renders every non-empty tile over the farm for the usual map zooms."""
+    layers = get_map_layers()
+    for z in zooms or PREGENERATE_ZOOMS:
+        tile_range = get_farm_tile_range(layers, z)
+        if not tile_range:
+            return
+        first_x, first_y, last_x, last_y = tile_range
+        for x in range(first_x, last_x + 1):
+            for y in range(first_y, last_y + 1):
+                get_tile(z, x, y)
+
+
+def invalidate_map_geometry(doc=None, method=None, *args):
+    """
+    doc_events handler for Zone, Bed and Warehouse: drops cached layers and tiles after commit.
+    However many documents a transaction saves, the version moves and the tiles are dropped once.
+    """
+    if doc is not None and doc.doctype == "Warehouse" and doc.get("warehouse_type") != "Greenhouse":
+        return
+
+    if not frappe.flags.map_geometry_changed:
+        frappe.flags.map_geometry_changed = True
+        frappe.db.after_commit.add(refresh_map_geometry)
+        frappe.db.after_rollback.add(discard_map_geometry_change)
+
+
+def discard_map_geometry_change():
+    frappe.flags.pop("map_geometry_changed", None)
+
+
+def refresh_map_geometry():
+    """after_commit callback: moves the geometry version, drops layers and tiles, then re-renders."""
+    global _local_layers
+    if not frappe.flags.pop("map_geometry_changed", None):
+        return
+
+    cache = frappe.cache()
+    cache.set_value(MAP_GEOMETRY_VERSION_KEY, frappe.generate_hash(length=10))
+    cache.delete_value(MAP_LAYERS_CACHE_KEY)
+    # Tiles of older versions would expire anyway; this frees them now
+    cache.delete_keys(MAP_TILE_CACHE_KEY)
+    _local_layers = None
+
+    frappe.enqueue(
+        "upande_scp.serverscripts.map_tiles.pregenerate_tiles",
+        queue="long",
+        job_id="upande_scp:pregenerate_map_tiles",
+        deduplicate=True,
+    )
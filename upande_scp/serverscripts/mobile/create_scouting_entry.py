@@ -1,135 +1,54 @@
 import json
-import frappe
-from shapely.geometry import Point, LineString
-from shapely.ops import transform
-from pyproj import Transformer
-from functools import partial
-
-def get_dynamic_utm_epsg(latitude, longitude):
-    """Calculates the correct UTM EPSG code based on a point's coordinates."""
-    
-    # 1. Determine Zone Number (1 to 60)
-    zone_number = int((longitude + 180) / 6) + 1
-
-    # 2. Determine Hemisphere Prefix (326 for N, 327 for S)
-    if latitude >= 0:
-        epsg_prefix = 326 # Northern Hemisphere
-    else:
-        epsg_prefix = 327 # Southern Hemisphere
 
-    # 3. Construct the full EPSG code string
-    return f"EPSG:{epsg_prefix}{zone_number:02d}"
-
-def get_zone_from_coordinates(latitude, longitude, bed, accuracy):
+import frappe
+from frappe import _
+from frappe.utils import cint, flt, getdate, now_datetime, to_timedelta
+
+from upande_scp.serverscripts.greenhouse_locator import locate_greenhouses, locate_point
+from upande_scp.serverscripts.mobile.ingest_admission import admit_ingest_request, release_ingest_slot
+from upande_scp.serverscripts.mobile.payload_journal import journal_payload
+from upande_scp.serverscripts.mobile.sync_codec import make_sync_response, read_sync_body
+from upande_scp.serverscripts.zone_index import (
+    ALL_GREENHOUSES,
+    get_zone_index,
+    zone_buffer,
+    zone_confidence,
+)
+
+def get_zone_from_coordinates(latitude, longitude, bed, accuracy, greenhouse=None):
     try:
         lat = float(latitude)
         lon = float(longitude)
         accuracy_m = float(accuracy)
 
-        scout_point = Point(lon, lat)          # GeoJSON: lon, lat
-
         # --------------------------------------------------------------
-        #  NEW: flexible zone lookup (Already correct in your original code)
+        #  Zone lookup goes through the greenhouse's spatial index.
+        #  With a bed, the bed's own greenhouse is used so a wrong
+        #  greenhouse in the payload cannot hide the bed's zones.
         # --------------------------------------------------------------
         if bed is None or bed == "":
-            # No bed filter – return **all** zones
-            filters = {}
+            # Without a bed, the greenhouse outline containing the point bounds the search
+            greenhouse = locate_greenhouses([lat], [lon], [accuracy_m])[0] or greenhouse
             no_bed_msg = " (all beds)"
         else:
-            filters = {"bed": bed}
+            greenhouse = frappe.db.get_value("Bed", bed, "greenhouse") or greenhouse
             no_bed_msg = f" for bed: {bed}"
 
-        zones = frappe.get_all(
-            "Zone",
-            filters=filters,
-            fields=["name", "raw_geojson"]
-        )
+        zone_index = get_zone_index(greenhouse)
 
-        if not zones:
+        if not len(zone_index) or (bed and not zone_index.has_bed(bed)):
             return None, 0.0, f"No zones found{no_bed_msg}"
         # --------------------------------------------------------------
 
-        utm_epsg = get_dynamic_utm_epsg(lat, lon)
-
-        project_to_utm = Transformer.from_crs(
-            "EPSG:4326",
-            utm_epsg,
-            always_xy=True
-        ).transform
-
-        scout_point_utm = transform(project_to_utm, scout_point)
-
-        buffer_m = max(3.0, min(accuracy_m, 50.0))
-
-        closest_zone = None
-        min_distance = float('inf')
-        confidence = 0.0
-
-        for zone in zones:
-            try:
-                if not zone.raw_geojson:
-                    continue
-
-                # Parse GeoJSON
-                geojson_data = json.loads(zone.raw_geojson)
-
-                if (geojson_data.get("type") == "FeatureCollection" and
-                            geojson_data.get("features")):
-
-                    feature = geojson_data["features"][0]
-                    geometry = feature.get("geometry", {})
-
-                    if geometry.get("type") == "LineString":
-                        coords = geometry.get("coordinates", [])
-
-                        if len(coords) >= 2:
-                            # Create line in WGS84
-                            line = LineString(coords)
-
-                            # Transform line to UTM (meters)
-                            line_utm = transform(project_to_utm, line)
-
-                            # Calculate distance in meters (now accurate!)
-                            distance_m = scout_point_utm.distance(line_utm)
-
-                            # Create adaptive buffer in meters (not degrees!)
-                            zone_polygon_utm = line_utm.buffer(buffer_m)
-
-                            # Check if point is within buffered zone
-                            if zone_polygon_utm.contains(scout_point_utm):
-                                if distance_m < min_distance:
-                                    min_distance = distance_m
-                                    closest_zone = zone.name
+        scout_point_utm = zone_index.project(lat, lon)
 
-                                    # Calculate confidence based on distance vs accuracy
-                                    if distance_m <= accuracy_m * 0.3:
-                                        confidence = 1.0  # Excellent - right on the line
-                                    elif distance_m <= accuracy_m * 0.6:
-                                        confidence = 0.9  # Very good
-                                    elif distance_m <= accuracy_m:
-                                        confidence = 0.8  # Good - within accuracy circle
-                                    else:
-                                        confidence = 0.7  # Acceptable - within buffer
+        buffer_m = zone_buffer(accuracy_m)
 
-                            # If not in buffer, still track closest zone
-                            elif distance_m < min_distance:
-                                min_distance = distance_m
-                                closest_zone = zone.name
-
-                                # Lower confidence if outside buffer
-                                if distance_m <= accuracy_m * 1.5:
-                                    confidence = 0.5  # Fair - close but outside buffer
-                                elif distance_m <= accuracy_m * 2.0:
-                                    confidence = 0.3  # Poor - might be adjacent zone
-                                else:
-                                    confidence = 0.1  # Very poor - likely wrong zone
-
-            except Exception as e:
-                frappe.log_error(
-                    f"Error processing zone {zone.name}", str(e))
-                continue
+        closest_zone, min_distance = zone_index.nearest(scout_point_utm, bed=bed)
 
         if closest_zone:
+            confidence = zone_confidence(min_distance, accuracy_m, buffer_m)
+
             # Build detailed message with actual meter distances
             message = {
                 "distance": f"{min_distance:.1f}",
@@ -144,6 +63,136 @@ def get_zone_from_coordinates(latitude, longitude, bed, accuracy):
         frappe.log_error("Error",error_msg)
         return None, 0.0, error_msg
 
+def get_zones_for_entries(data_list):
+    """
+    Zone matching for a whole sync payload in one geometry pass.
+    Entries are grouped by greenhouse index; each group is projected and
+    measured together. Returns one (zone, confidence, message) tuple per
+    entry, or None where the entry has no coordinates/accuracy to match,
+    plus each entry's greenhouse: the sent bed's greenhouse, or without a bed
+    the greenhouse whose outline contains the point.
+    """
+    matches = [None] * len(data_list)
+    located_greenhouses = [None] * len(data_list)
+    # Entries with usable coordinates, before their greenhouse is known
+    pending = []
+
+    entries = [e if isinstance(e, dict) else {} for e in data_list]
+    beds = {e.get('bed') for e in entries if e.get('bed')}
+    bed_greenhouses = {}
+    if beds:
+        bed_greenhouses = {
+            b.name: b.greenhouse for b in frappe.get_all(
+                "Bed",
+                filters={"name": ["in", list(beds)]},
+                fields=["name", "greenhouse"]
+            )
+        }
+
+    for position, entry_data in enumerate(entries):
+        latitude = entry_data.get('latitude')
+        longitude = entry_data.get('longitude')
+        accuracy = entry_data.get('accuracy')
+        bed = entry_data.get('bed')
+
+        if not (latitude and longitude and accuracy):
+            continue
+
+        try:
+            point = (float(latitude), float(longitude), float(accuracy))
+        except (TypeError, ValueError):
+            # Let the single-entry path build the usual error message
+            matches[position] = get_zone_from_coordinates(latitude, longitude, bed, accuracy)
+            continue
+
+        pending.append((position, point, bed))
+
+    # Point-in-polygon against the greenhouse outlines for the whole payload
+    groups = {}
+    if pending:
+        try:
+            located = locate_greenhouses(
+                [lat for _, (lat, _, _), _ in pending],
+                [lon for _, (_, lon, _), _ in pending],
+                [acc for _, (_, _, acc), _ in pending]
+            )
+        except Exception as e:
+            frappe.log_error("Error locating greenhouses", str(e))
+            located = [None] * len(pending)
+
+        for row, (position, point, bed) in enumerate(pending):
+            # A sent bed fixes the greenhouse; the outline only corrects entries without one
+            located_greenhouses[position] = bed_greenhouses.get(bed) or located[row]
+            # Entries placed in no greenhouse are matched against the farm-wide index
+            greenhouse = located_greenhouses[position] or entries[position].get('greenhouse') or ALL_GREENHOUSES
+            groups.setdefault(greenhouse, []).append((position, point, bed))
+
+    for greenhouse, rows in groups.items():
+        try:
+            zone_index = get_zone_index(greenhouse)
+            zones, distances, confidences = zone_index.locate_batch(
+                [lat for _, (lat, _, _), _ in rows],
+                [lon for _, (_, lon, _), _ in rows],
+                [acc for _, (_, _, acc), _ in rows],
+                [bed for _, _, bed in rows]
+            )
+        except Exception as e:
+            error_msg = f"Error in get_zones_for_entries: {e}"
+            frappe.log_error("Error", error_msg)
+            for position, _, _ in rows:
+                matches[position] = (None, 0.0, error_msg)
+            continue
+
+        for row, (position, (_, _, accuracy_m), bed) in enumerate(rows):
+            no_bed_msg = f" for bed: {bed}" if bed else " (all beds)"
+            if not len(zone_index) or (bed and not zone_index.has_bed(bed)):
+                matches[position] = (None, 0.0, f"No zones found{no_bed_msg}")
+            elif zones[row]:
+                matches[position] = (zones[row], float(confidences[row]), {
+                    "distance": f"{distances[row]:.1f}",
+                    "buffer": f"{zone_buffer(accuracy_m):.1f}"
+                })
+            else:
+                matches[position] = (None, 0.0, f"No zone found within range (accuracy: {accuracy_m}m)")
+
+    return matches, located_greenhouses
+
+
+@frappe.whitelist()
+def resolveLocation():
+    """
+    Resolves greenhouse, bed and zone from bare coordinates.
+    The greenhouse comes from the Warehouse outline containing the point, and
+    only that greenhouse's zones are searched.
+    """
+    try:
+        latitude = frappe.form_dict.get("latitude")
+        longitude = frappe.form_dict.get("longitude")
+
+        if not latitude or not longitude:
+            frappe.response.http_status_code = 400
+            frappe.response["data"] = {
+                "status": "error",
+                "message": "Latitude and longitude are required."
+            }
+            return
+
+        frappe.response["data"] = locate_point(
+            latitude,
+            longitude,
+            accuracy=frappe.form_dict.get("accuracy"),
+            greenhouse=frappe.form_dict.get("greenhouse")
+        )
+        frappe.response.http_status_code = 200
+
+    except Exception as e:
+        frappe.log_error("Error resolving location", str(e))
+        frappe.response.http_status_code = 500
+        frappe.response["data"] = {
+            "status": "error",
+            "message": str(e)
+        }
+
 @frappe.whitelist()
 def fetchTraps(greenhouse=None):
     """
@@ -203,11 +252,607 @@ def fetchTrapPests():
             "message": str(e)
         }
         
+def add_child_items(parent_doc, parent_field, items_list):
+    if items_list and isinstance(items_list, list):
+        for item in items_list:
+            if not item:
+                continue
+
+            child_row = parent_doc.append(parent_field, {})
+
+            if parent_field == "predators_scouting_entry":
+                child_row.plant_section = item.get(
+                    "plant_section")
+                child_row.predator = item.get("predator")
+                child_row.stage = item.get("stage")
+                child_row.count = item.get("count")
+
+            elif parent_field == "diseases_scouting_entry":
+                child_row.plant_section = item.get(
+                    "plant_section")
+                child_row.disease = item.get("disease")
+                child_row.count = item.get("count")
+                child_row.stage = item.get("stage")
+
+            elif parent_field == "physiological_disorders_entry":
+                child_row.plant_section = item.get(
+                    "plant_section")
+                child_row.physiological_disorders = item.get(
+                    "physiological_disorders")
+
+            elif parent_field == "weeds_scouting_entry":
+                child_row.weed = item.get("weed")
+
+            elif parent_field == "pests_scouting_entry":
+                child_row.plant_section = item.get(
+                    "plant_section")
+                child_row.pest = item.get("pest")
+                child_row.stage = item.get("stage")
+                child_row.count = item.get("count")
+
+            elif parent_field == "incidents_scouting_entry":
+                child_row.incident = item.get("incident")
+                
+            elif parent_field == "trap_scouting_entry":
+                child_row.trap = item.get("trap")
+                child_row.pest = item.get("pest")
+                child_row.location = item.get("location", "Indoor")
+                child_row.count = item.get("count")
+
+def get_existing_client_entries(data_list):
+    """Maps the client entry IDs of a payload to Scouting Entries already created for them, in one query."""
+    client_entry_ids = {
+        e.get('client_entry_id') for e in data_list
+        if isinstance(e, dict) and e.get('client_entry_id')
+    }
+    if not client_entry_ids:
+        return {}
+
+    return {
+        e.client_entry_id: e.name for e in frappe.get_all(
+            "Scouting Entry",
+            filters={"client_entry_id": ["in", list(client_entry_ids)]},
+            fields=["name", "client_entry_id"]
+        )
+    }
+
+def existing_entry_result(client_entry_id, name):
+    """Result for a retried upload whose entry was already created."""
+    return {
+        "status": "success",
+        "message": "Scouting Entry already exists.",
+        "name": name,
+        "client_entry_id": client_entry_id,
+        "existing": True
+    }
+
+def get_duplicate_key(employee, greenhouse, date_of_capture, time_of_capture):
+    """Normalised (employee, greenhouse, date, time) key, or None if the date/time cannot be parsed."""
+    try:
+        return (employee, greenhouse, getdate(date_of_capture), to_timedelta(time_of_capture))
+    except Exception:
+        return None
+
+class IngestContext:
+    """
+    Lookups shared by every entry of one sync payload, each loaded with a single
+    set-based query: zone matches, client entry IDs, employees, the existing
+    entries that new ones could duplicate, and the catalog names the entries link to.
+    """
+
+    def __init__(self, data_list):
+        entries = [e if isinstance(e, dict) else {} for e in data_list]
+
+        # Match every entry of the payload to its zone in one pass
+        self.zone_matches, self.located_greenhouses = get_zones_for_entries(data_list)
+        self.client_entries = get_existing_client_entries(entries)
+        self.employees = self.load_employees(entries)
+        self.existing_entries = self.load_existing_entries(entries)
+        self.link_names = self.load_link_names(entries)
+
+    def load_employees(self, entries):
+        user_ids = {e.get('scouts_name') for e in entries if e.get('scouts_name')}
+        if not user_ids:
+            return {}
+
+        employees = {}
+        for employee in frappe.get_all(
+            "Employee",
+            filters={"user_id": ["in", list(user_ids)]},
+            fields=["name", "user_id"]
+        ):
+            # Same pick as the old per-entry lookup when a user has several employees
+            employees.setdefault(employee.user_id, employee.name)
+        return employees
+
+    def load_existing_entries(self, entries):
+        """Existing (employee, greenhouse, date, time) keys for the payload's scouts and dates, with their beds and zones."""
+        dates = set()
+        for e in entries:
+            try:
+                dates.add(getdate(e.get('date_of_capture')))
+            except Exception:
+                continue
+        if not self.employees or not dates:
+            return {}
+
+        existing = {}
+        for entry in frappe.get_all(
+            "Scouting Entry",
+            filters={
+                "scouts_name": ["in", list(set(self.employees.values()))],
+                "date_of_capture": ["in", list(dates)]
+            },
+            fields=["scouts_name", "greenhouse", "date_of_capture", "time_of_capture", "bed", "zone"]
+        ):
+            key = get_duplicate_key(entry.scouts_name, entry.greenhouse, entry.date_of_capture, entry.time_of_capture)
+            existing.setdefault(key, []).append((entry.bed, entry.zone))
+        return existing
+
+    def load_link_names(self, entries):
+        """
+        Snapshot of every Link value the payload can reference, one query per linked doctype.
+        Maps doctype -> {casefolded value: stored name, or None if it does not exist}.
+        """
+        meta = frappe.get_meta("Scouting Entry")
+        referenced = {}
+
+        def add(doctype, value):
+            if value:
+                referenced.setdefault(doctype, set()).add(str(value))
+
+        for e in entries:
+            add("Warehouse", e.get('greenhouse'))
+            add("Bed", e.get('bed'))
+            for table_df in meta.get_table_fields():
+                rows = e.get(table_df.fieldname)
+                if not isinstance(rows, list):
+                    continue
+                link_fields = frappe.get_meta(table_df.options).get_link_fields()
+                for row in rows:
+                    if isinstance(row, dict):
+                        for df in link_fields:
+                            add(df.options, row.get(df.fieldname))
+
+        for greenhouse in self.located_greenhouses:
+            add("Warehouse", greenhouse)
+        for match in self.zone_matches:
+            if match:
+                add("Zone", match[0])
+
+        link_names = {"Employee": {name.casefold(): name for name in self.employees.values()}}
+        for doctype, values in referenced.items():
+            names = link_names.setdefault(doctype, {})
+            names.update({value.casefold(): None for value in values})
+            names.update({
+                name.casefold(): name for name in frappe.get_all(
+                    doctype, filters={"name": ["in", list(values)]}, pluck="name"
+                )
+            })
+        return link_names
+
+    def get_link_name(self, doctype, value):
+        names = self.link_names.setdefault(doctype, {})
+        key = str(value).casefold()
+        if key not in names:
+            # Not referenced by the payload up front (e.g. a default); look it up once
+            names[key] = frappe.db.get_value(doctype, value, "name")
+        return names[key]
+
+    def validate_links(self, doc):
+        """
+        Checks every Link on the document and its child rows against the snapshot,
+        with the same message Document._validate_links gives, then turns off the
+        per-row link queries for the insert.
+        """
+        invalid_links = []
+        for d in [doc, *doc.get_all_children()]:
+            for df in d.meta.get_link_fields():
+                value = d.get(df.fieldname)
+                if not value:
+                    continue
+
+                name = self.get_link_name(df.options, value)
+                if name:
+                    d.set(df.fieldname, name)
+                elif d.get("parentfield"):
+                    invalid_links.append("{} #{}: {}: {}".format(_("Row"), d.idx, _(df.label), value))
+                else:
+                    invalid_links.append(f"{_(df.label)}: {value}")
+
+        if invalid_links:
+            frappe.throw(_("Could not find {0}").format(", ".join(invalid_links)), frappe.LinkValidationError)
+
+        doc.flags.ignore_links = True
+
+    def is_duplicate(self, key, bed, zone):
+        """Bed and zone only narrow the match when the new entry has them, like the old filters."""
+        return any(
+            (not bed or bed == existing_bed) and (not zone or zone == existing_zone)
+            for existing_bed, existing_zone in self.existing_entries.get(key, [])
+        )
+
+    def add_entry(self, key, bed, zone, client_entry_id=None, name=None):
+        """Records an entry created by this payload so later entries see it."""
+        if key:
+            self.existing_entries.setdefault(key, []).append((bed, zone))
+        if client_entry_id:
+            self.client_entries[client_entry_id] = name
+
+def create_scouting_entry(entry_data, entry_position, context):
+    """
+    Validates one payload entry and inserts its Scouting Entry with the GPS metadata.
+    Returns the per-entry result; nothing is committed here.
+    An entry whose client_entry_id is already known returns the existing entry instead.
+    """
+    # Idempotent replay of an upload the server has already accepted
+    client_entry_id = entry_data.get('client_entry_id')
+    if client_entry_id and context.client_entries.get(client_entry_id):
+        return existing_entry_result(client_entry_id, context.client_entries[client_entry_id])
+
+    # Extract location data
+    latitude = entry_data.get('latitude')
+    longitude = entry_data.get('longitude')
+    accuracy = entry_data.get('accuracy')
+    # Bed is now optional (can be None)
+    bed = entry_data.get('bed') 
+
+    # Extract optional metadata from Flutter
+    quality_level = entry_data.get('quality_level', 'unknown')
+    samples_used = entry_data.get('samples_used', 0)
+    is_stationary = entry_data.get('is_stationary', False)
+
+    # Validate required fields
+    if not latitude or not longitude:
+        return {
+            "status": "error",
+            "message": "Latitude and longitude are required."
+        }
+
+    # --- START OF CHANGE: Conditional logic for Bed and Zone determination ---
+    determined_zone = None
+    confidence = 0.0
+    zone_message = None
+    
+    # Zone determination was attempted up front for entries with coordinates
+    if context.zone_matches[entry_position]:
+        determined_zone, confidence, zone_message = context.zone_matches[entry_position]
+
+    # If zone determination was attempted but failed, log it as a non-fatal error 
+    # UNLESS 'bed' was provided, which suggests the client expected a zone.
+    # However, for maximum flexibility, we only halt if bed was provided AND zone failed.
+    # If bed is missing, we allow zone to be None (for non-bed-based scouting)
+    if bed and not determined_zone:
+        # Use a default message if zone_message isn't set due to an earlier error in get_zone_from_coordinates
+        msg = zone_message or f"Could not determine zone for provided Bed: {bed}"
+        return {
+            "status": "error",
+            "message": f"Could not determine zone: {msg}",
+            "coordinates": f"({latitude}, {longitude})",
+            "accuracy": accuracy,
+            "bed": bed
+        }
+    
+    # Set default zone message structure if zone determination was skipped or failed without a detailed message
+    if not zone_message:
+         zone_message = {
+            "distance": "0.0",
+            "buffer": "0.0"
+        }
+    
+    # The 'bed' field in the document will be the value from the payload (even if None/empty)
+    # The 'zone' field in the document will be the determined_zone (which can be None if not found/needed)
+    
+    # --- END OF CHANGE: Conditional logic for Bed and Zone determination ---
+    
+    # Warn if confidence is too low (but still allow submission)
+    requires_review = confidence < 0.5 and determined_zone is not None
+
+    # The bed's greenhouse, or without a bed the outline containing the point,
+    # wins over a missing or wrong greenhouse
+    greenhouse = entry_data.get('greenhouse')
+    greenhouse_corrected_from = None
+    located_greenhouse = context.located_greenhouses[entry_position]
+    if located_greenhouse and located_greenhouse != greenhouse:
+        greenhouse_corrected_from = greenhouse
+        greenhouse = located_greenhouse
+
+    # Get employee ID
+    employee_id = context.employees.get(entry_data.get('scouts_name'))
+
+    if not employee_id:
+        return {
+            "status": "error",
+            "message": f"Employee not found: {entry_data.get('scouts_name')}"
+        }
+
+    # Check for duplicate entry on scout, greenhouse and time; bed and zone narrow it when present.
+    # The unique client_entry_id index replaces this check when the app sends one.
+    duplicate_key = get_duplicate_key(
+        employee_id, greenhouse, entry_data.get('date_of_capture'), entry_data.get('time_of_capture')
+    )
+    if not client_entry_id:
+        if duplicate_key:
+            duplicate_entry = context.is_duplicate(duplicate_key, bed, determined_zone)
+        else:
+            duplicate_filters = {
+                "scouts_name": employee_id,
+                "greenhouse": greenhouse,
+                "date_of_capture": entry_data.get('date_of_capture'),
+                "time_of_capture": entry_data.get('time_of_capture')
+            }
+            # Only add bed and zone to duplicate check if they exist
+            if bed:
+                duplicate_filters["bed"] = bed
+            if determined_zone:
+                duplicate_filters["zone"] = determined_zone
+            duplicate_entry = frappe.db.exists("Scouting Entry", duplicate_filters)
+
+        if duplicate_entry:
+            # This is still an error even if no bed/zone, as it's a time-based duplicate
+            return {
+                "status": "error",
+                "message": "Duplicate scouting entry found for this scout, greenhouse, and time."
+            }
+
+    # Create scouting entry
+    scout_doc = frappe.new_doc("Scouting Entry")
+    scout_doc.scouts_name = employee_id
+    scout_doc.greenhouse = greenhouse
+    scout_doc.bed = bed # Stays the provided value (can be None)
+    scout_doc.zone = determined_zone # Stays the determined value (can be None)
+    scout_doc.time_of_capture = entry_data.get('time_of_capture')
+    scout_doc.date_of_capture = entry_data.get('date_of_capture')
+    scout_doc.latitude = latitude
+    scout_doc.longitude = longitude
+    scout_doc.client_entry_id = client_entry_id
+
+    # GPS metadata is stored in typed columns on the entry itself
+    scout_doc.calculated_zone = determined_zone
+    scout_doc.gps_accuracy = flt(accuracy)
+    scout_doc.gps_quality = quality_level
+    scout_doc.gps_confidence = confidence
+    scout_doc.gps_samples_used = cint(samples_used)
+    scout_doc.stationary = 1 if is_stationary else 0
+    # Use values from the (potentially default) zone_message
+    scout_doc.zone_buffer = flt(zone_message["buffer"])
+    scout_doc.distance = flt(zone_message["distance"])
+
+    add_child_items(scout_doc, "predators_scouting_entry",
+                    entry_data.get("predators_scouting_entry"))
+    add_child_items(scout_doc, "diseases_scouting_entry",
+                    entry_data.get("diseases_scouting_entry"))
+    add_child_items(scout_doc, "physiological_disorders_entry", entry_data.get(
+        "physiological_disorders_entry"))
+    add_child_items(scout_doc, "weeds_scouting_entry",
+                    entry_data.get("weeds_scouting_entry"))
+    add_child_items(scout_doc, "pests_scouting_entry",
+                    entry_data.get("pests_scouting_entry"))
+    add_child_items(scout_doc, "incidents_scouting_entry",
+                    entry_data.get("incidents_scouting_entry"))
+    add_child_items(scout_doc, "trap_scouting_entry",
+                    entry_data.get("trap_scouting_entry"))
+    # All links were checked against the payload's catalog snapshot; skip the per-row queries
+    context.validate_links(scout_doc)
+
+    try:
+        scout_doc.insert()
+    except frappe.UniqueValidationError:
+        # A concurrent retry of the same upload inserted it first; a locking read sees its commit
+        existing = client_entry_id and frappe.db.get_value(
+            "Scouting Entry", {"client_entry_id": client_entry_id}, "name", for_update=True
+        )
+        if not existing:
+            raise
+        frappe.clear_last_message()
+        context.add_entry(None, None, None, client_entry_id, existing)
+        return existing_entry_result(client_entry_id, existing)
+
+    # Build success response with detailed info
+    result = {
+        "status": "success",
+        "message": "Scouting Entry created successfully.",
+        "name": scout_doc.name,
+        "determined_zone": determined_zone,
+        "zone_confidence": round(confidence * 100, 1) if determined_zone else 0.0,
+        "gps_accuracy": accuracy,
+        "quality_level": quality_level,
+        "zone_detection_details": zone_message,
+        "greenhouse": greenhouse
+    }
+
+    if client_entry_id:
+        result["client_entry_id"] = client_entry_id
+    context.add_entry(duplicate_key, bed, determined_zone, client_entry_id, scout_doc.name)
+
+    if greenhouse != entry_data.get('greenhouse'):
+        result["greenhouse_corrected_from"] = greenhouse_corrected_from
+
+    # Add warning if confidence is low
+    if requires_review:
+        result["warning"] = (f"Low confidence ({confidence*100:.0f}%) - "
+                             f"Zone may need manual verification")
+
+    return result
+
+def ingest_scouting_entries(data_list, bulk=False):
+    """
+    Creates the Scouting Entries of one sync payload and returns the per-entry results.
+    By default every entry is committed on its own. In bulk mode the whole payload
+    is one transaction and each entry gets a savepoint, so a failed entry only
+    rolls back its own rows.
+    """
+    results = []
+
+    context = IngestContext(data_list)
+
+    for entry_position, entry_data in enumerate(data_list):
+        savepoint = f"scouting_entry_{entry_position}"
+        if bulk:
+            frappe.db.savepoint(savepoint)
+
+        try:
+            result = create_scouting_entry(entry_data, entry_position, context)
+
+            if bulk:
+                frappe.db.release_savepoint(savepoint)
+            elif result["status"] == "success":
+                # Commit the entry
+                frappe.db.commit()
+
+        except Exception as e:
+            if bulk:
+                frappe.db.rollback(save_point=savepoint)
+            else:
+                frappe.db.rollback()
+            frappe.log_error("Error creating scouting entry", str(e))
+            result = {
+                "status": "error",
+                "message": str(e)
+            }
+
+        results.append(result)
+
+    if bulk:
+        frappe.db.commit()
+
+    return results
+
+def get_ingest_status_code(results):
+    """200 when every entry succeeded, 400 when all failed, 207 for a mix."""
+    has_errors = any(r.get("status") == "error" for r in results)
+    if has_errors:
+        if len(results) > 0 and all(r.get("status") == "error" for r in results):
+            # All entries failed
+            return 400
+        # Partial success (some succeeded, some failed)
+        return 207  # Multi-Status
+    # All succeeded
+    return 200
+
+def queue_scouting_entries(data_list, bulk=False):
+    """Stores the raw payload on a Scouting Sync Receipt and queues it for a background worker."""
+    receipt = frappe.get_doc({
+        "doctype": "Scouting Sync Receipt",
+        "status": "Queued",
+        "user": frappe.session.user,
+        "bulk": bulk,
+        "entry_count": len(data_list),
+        "payload": json.dumps(data_list)
+    })
+    receipt.insert(ignore_permissions=True)
+
+    frappe.enqueue(
+        "upande_scp.serverscripts.mobile.create_scouting_entry.process_scouting_receipt",
+        queue="long",
+        job_id=f"scouting_sync::{receipt.name}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        receipt_name=receipt.name
+    )
+
+    return receipt
+
+def process_scouting_receipt(receipt_name):
+    """Background job: runs a queued payload and stores the per-entry results on its receipt."""
+    receipt = frappe.get_doc("Scouting Sync Receipt", receipt_name)
+    if receipt.status not in ("Queued", "Failed"):
+        return
+
+    receipt.db_set({"status": "Processing", "started_at": now_datetime(), "error": None})
+    frappe.db.commit()
+
+    try:
+        results = ingest_scouting_entries(json.loads(receipt.payload), bulk=receipt.bulk)
+        success_count = sum(1 for r in results if r.get("status") == "success")
+
+        receipt.db_set({
+            "status": "Completed",
+            "completed_at": now_datetime(),
+            "results": json.dumps(results, default=str),
+            "success_count": success_count,
+            "error_count": len(results) - success_count,
+            "http_status": get_ingest_status_code(results)
+        })
+
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.log_error(frappe.get_traceback(), "Scouting Sync Error")
+        receipt.db_set({"status": "Failed", "completed_at": now_datetime(), "error": str(e)})
+
+    frappe.db.commit()
+
 @frappe.whitelist()
-def createScoutingEntry():
+def getScoutingSyncStatus(receipt_id):
+    """
+    Status of an async createScoutingEntry upload.
+    Per-entry results are included once the receipt is Completed.
+    """
     try:
-        data = frappe.request.get_json()
-        frappe.log_error("Scouting Payload", data)
+        receipt = frappe.db.get_value(
+            "Scouting Sync Receipt",
+            receipt_id,
+            ["name", "status", "user", "entry_count", "success_count", "error_count",
+             "http_status", "started_at", "completed_at", "results", "error"],
+            as_dict=True
+        )
+
+        if not receipt or (receipt.user != frappe.session.user and "System Manager" not in frappe.get_roles()):
+            frappe.response.http_status_code = 404
+            frappe.response["data"] = {
+                "status": "error",
+                "message": f"Sync receipt not found: {receipt_id}"
+            }
+            return
+
+        data = {
+            "receipt_id": receipt.name,
+            "status": receipt.status,
+            "entry_count": receipt.entry_count,
+            "success_count": receipt.success_count,
+            "error_count": receipt.error_count,
+            "started_at": receipt.started_at,
+            "completed_at": receipt.completed_at
+        }
+        if receipt.status == "Completed":
+            data["http_status"] = receipt.http_status
+            data["results"] = json.loads(receipt.results or "[]")
+        elif receipt.status == "Failed":
+            data["error"] = receipt.error
+
+        frappe.response["data"] = data
+        frappe.response.http_status_code = 200
+
+    except Exception as e:
+        frappe.log_error("Error fetching scouting sync status", str(e))
+        frappe.response.http_status_code = 500
+        frappe.response["data"] = {
+            "status": "error",
+            "message": str(e)
+        }
+
+def handle_scouting_upload():
+    """Runs one createScoutingEntry upload and leaves its status and data on frappe.response."""
+    try:
+        try:
+            data = read_sync_body()
+        except ValueError as e:
+            frappe.response.http_status_code = 400
+            frappe.response["data"] = {
+                "status": "error",
+                "message": f"Could not decode the request body: {e}"
+            }
+            return
+
+        bulk = cint(frappe.request.args.get("bulk"))
+        is_async = cint(frappe.request.args.get("async"))
+
+        if data:
+            try:
+                journal_payload(data, bulk=bulk, mode="async" if is_async else "sync")
+            except Exception as e:
+                # The journal is for replay only; never refuse an upload over it
+                frappe.log_error("Error journalling scouting payload", str(e))
 
         if not data:
             frappe.response.http_status_code = 400
@@ -229,256 +874,22 @@ def createScoutingEntry():
             }
             return
 
-        results = []
-        has_errors = False
-
-        for entry_data in data_list:
-            try:
-                # Extract location data
-                latitude = entry_data.get('latitude')
-                longitude = entry_data.get('longitude')
-                accuracy = entry_data.get('accuracy')
-                # Bed is now optional (can be None)
-                bed = entry_data.get('bed') 
-
-                # Extract optional metadata from Flutter
-                quality_level = entry_data.get('quality_level', 'unknown')
-                samples_used = entry_data.get('samples_used', 0)
-                is_stationary = entry_data.get('is_stationary', False)
-
-                # Validate required fields
-                if not latitude or not longitude:
-                    has_errors = True
-                    results.append({
-                        "status": "error",
-                        "message": "Latitude and longitude are required."
-                    })
-                    continue
-
-                # --- START OF CHANGE: Conditional logic for Bed and Zone determination ---
-                determined_zone = None
-                confidence = 0.0
-                zone_message = None
-                
-                # We only need to attempt zone determination if we have coordinates
-                if latitude and longitude and accuracy:
-                    # Determine zone with accuracy-aware logic
-                    determined_zone, confidence, zone_message = get_zone_from_coordinates(
-                        latitude,
-                        longitude,
-                        bed, # Pass bed, which can be None or ""
-                        accuracy
-                    )
-
-                # If zone determination was attempted but failed, log it as a non-fatal error 
-                # UNLESS 'bed' was provided, which suggests the client expected a zone.
-                # However, for maximum flexibility, we only halt if bed was provided AND zone failed.
-                # If bed is missing, we allow zone to be None (for non-bed-based scouting)
-                if bed and not determined_zone:
-                    has_errors = True
-                    # Use a default message if zone_message isn't set due to an earlier error in get_zone_from_coordinates
-                    msg = zone_message or f"Could not determine zone for provided Bed: {bed}"
-                    results.append({
-                        "status": "error",
-                        "message": f"Could not determine zone: {msg}",
-                        "coordinates": f"({latitude}, {longitude})",
-                        "accuracy": accuracy,
-                        "bed": bed
-                    })
-                    continue
-                
-                # Set default zone message structure if zone determination was skipped or failed without a detailed message
-                if not zone_message:
-                     zone_message = {
-                        "distance": "0.0",
-                        "buffer": "0.0"
-                    }
-                
-                # The 'bed' field in the document will be the value from the payload (even if None/empty)
-                # The 'zone' field in the document will be the determined_zone (which can be None if not found/needed)
-                
-                # --- END OF CHANGE: Conditional logic for Bed and Zone determination ---
-                
-                # Warn if confidence is too low (but still allow submission)
-                requires_review = confidence < 0.5 and determined_zone is not None
-
-                # Check for duplicate entry - ONLY IF we have a determined_zone
-                duplicate_filters = {
-                    "scouts_name": entry_data.get('scouts_name'),
-                    "greenhouse": entry_data.get('greenhouse'),
-                    "date_of_capture": entry_data.get('date_of_capture'),
-                    "time_of_capture": entry_data.get('time_of_capture')
-                }
-                
-                # Only add bed and zone to duplicate check if they exist
-                if bed:
-                    duplicate_filters["bed"] = bed
-                if determined_zone:
-                    duplicate_filters["zone"] = determined_zone
-
-                duplicate_entry = frappe.db.exists("Scouting Entry", duplicate_filters)
-
-                if duplicate_entry:
-                    # This is still an error even if no bed/zone, as it's a time-based duplicate
-                    has_errors = True
-                    results.append({
-                        "status": "error",
-                        "message": "Duplicate scouting entry found for this scout, greenhouse, and time."
-                    })
-                    continue
-
-                # Get employee ID
-                employee_id = frappe.get_all(
-                    "Employee",
-                    fields=["name"],
-                    filters={"user_id": entry_data.get('scouts_name')}
-                )
-
-                if not employee_id:
-                    has_errors = True
-                    results.append({
-                        "status": "error",
-                        "message": f"Employee not found: {entry_data.get('scouts_name')}"
-                    })
-                    continue
-
-                # Create scouting entry
-                scout_doc = frappe.new_doc("Scouting Entry")
-                scout_doc.scouts_name = employee_id[0].name
-                scout_doc.greenhouse = entry_data.get('greenhouse')
-                scout_doc.bed = bed # Stays the provided value (can be None)
-                scout_doc.zone = determined_zone # Stays the determined value (can be None)
-                scout_doc.time_of_capture = entry_data.get('time_of_capture')
-                scout_doc.date_of_capture = entry_data.get('date_of_capture')
-                scout_doc.latitude = latitude
-                scout_doc.longitude = longitude
-
-                # Create metadata document (will be inserted after scout_doc)
-                scout_metadata_doc = frappe.new_doc("Scouting Entry Metadata")
-                scout_metadata_doc.latitude = latitude
-                scout_metadata_doc.longitude = longitude
-                scout_metadata_doc.calculated_zone = determined_zone
-                scout_metadata_doc.gps_accuracy = accuracy
-                scout_metadata_doc.gps_quality = quality_level
-                scout_metadata_doc.gps_confidence = confidence
-                scout_metadata_doc.gps_samples_used = samples_used
-                scout_metadata_doc.stationary = is_stationary
-                # Use values from the (potentially default) zone_message
-                scout_metadata_doc.zone_buffer = zone_message["buffer"]
-                scout_metadata_doc.distance = zone_message["distance"]
-
-                def add_child_items(parent_doc, parent_field, items_list):
-                    if items_list and isinstance(items_list, list):
-                        for item in items_list:
-                            if not item:
-                                continue
-
-                            child_row = parent_doc.append(parent_field, {})
-
-                            if parent_field == "predators_scouting_entry":
-                                child_row.plant_section = item.get(
-                                    "plant_section")
-                                child_row.predator = item.get("predator")
-                                child_row.stage = item.get("stage")
-                                child_row.count = item.get("count")
-
-                            elif parent_field == "diseases_scouting_entry":
-                                child_row.plant_section = item.get(
-                                    "plant_section")
-                                child_row.disease = item.get("disease")
-                                child_row.count = item.get("count")
-                                child_row.stage = item.get("stage")
-
-                            elif parent_field == "physiological_disorders_entry":
-                                child_row.plant_section = item.get(
-                                    "plant_section")
-                                child_row.physiological_disorders = item.get(
-                                    "physiological_disorders")
-
-                            elif parent_field == "weeds_scouting_entry":
-                                child_row.weed = item.get("weed")
-
-                            elif parent_field == "pests_scouting_entry":
-                                child_row.plant_section = item.get(
-                                    "plant_section")
-                                child_row.pest = item.get("pest")
-                                child_row.stage = item.get("stage")
-                                child_row.count = item.get("count")
-
-                            elif parent_field == "incidents_scouting_entry":
-                                child_row.incident = item.get("incident")
-                                
-                            elif parent_field == "trap_scouting_entry":
-                                child_row.trap = item.get("trap")
-                                child_row.pest = item.get("pest")
-                                child_row.location = item.get("location", "Indoor")
-                                child_row.count = item.get("count")
-
-                add_child_items(scout_doc, "predators_scouting_entry",
-                                entry_data.get("predators_scouting_entry"))
-                add_child_items(scout_doc, "diseases_scouting_entry",
-                                entry_data.get("diseases_scouting_entry"))
-                add_child_items(scout_doc, "physiological_disorders_entry", entry_data.get(
-                    "physiological_disorders_entry"))
-                add_child_items(scout_doc, "weeds_scouting_entry",
-                                entry_data.get("weeds_scouting_entry"))
-                add_child_items(scout_doc, "pests_scouting_entry",
-                                entry_data.get("pests_scouting_entry"))
-                add_child_items(scout_doc, "incidents_scouting_entry",
-                                entry_data.get("incidents_scouting_entry"))
-                add_child_items(scout_doc, "trap_scouting_entry",
-                                entry_data.get("trap_scouting_entry"))
-                # Insert scout entry first
-                scout_doc.insert()
-
-                # Link metadata to scout entry and insert
-                scout_metadata_doc.scouting_entry = scout_doc.name
-                scout_metadata_doc.insert()
-
-                # Commit both documents
-                frappe.db.commit()
-
-                # Build success response with detailed info
-                result = {
-                    "status": "success",
-                    "message": "Scouting Entry created successfully.",
-                    "name": scout_doc.name,
-                    "metadata_name": scout_metadata_doc.name,
-                    "determined_zone": determined_zone,
-                    "zone_confidence": round(confidence * 100, 1) if determined_zone else 0.0,
-                    "gps_accuracy": accuracy,
-                    "quality_level": quality_level,
-                    "zone_detection_details": zone_message
-                }
-
-                # Add warning if confidence is low
-                if requires_review:
-                    result["warning"] = (f"Low confidence ({confidence*100:.0f}%) - "
-                                         f"Zone may need manual verification")
-
-                results.append(result)
+        if is_async:
+            receipt = queue_scouting_entries(data_list, bulk=bulk)
+            frappe.response.http_status_code = 202
+            frappe.response["data"] = {
+                "status": "queued",
+                "receipt_id": receipt.name,
+                "entry_count": receipt.entry_count,
+                "status_url": "/api/method/upande_scp.serverscripts.mobile.create_scouting_entry"
+                              f".getScoutingSyncStatus?receipt_id={receipt.name}"
+            }
+            return
 
-            except Exception as e:
-                has_errors = True
-                frappe.db.rollback()
-                frappe.log_error("Error creating scouting entry", str(e))
-                results.append({
-                    "status": "error",
-                    "message": str(e)
-                })
+        results = ingest_scouting_entries(data_list, bulk=bulk)
 
         # Set appropriate HTTP status code based on results
-        if has_errors:
-            if len(results) > 0 and all(r.get("status") == "error" for r in results):
-                # All entries failed
-                frappe.response.http_status_code = 400
-            else:
-                # Partial success (some succeeded, some failed)
-                frappe.response.http_status_code = 207  # Multi-Status
-        else:
-            # All succeeded
-            frappe.response.http_status_code = 200
-
+        frappe.response.http_status_code = get_ingest_status_code(results)
         frappe.response["data"] = results
 
     except Exception as e:
@@ -487,4 +898,45 @@ def createScoutingEntry():
         frappe.response["data"] = {
             "status": "error",
             "message": str(e)
-        }
\ No newline at end of file
+        }
+
+@frappe.whitelist()
+def createScoutingEntry():
+    """
+    Creates Scouting Entries from a single entry or a list of entries.
+    Pass ?bulk=1 to write the whole payload in one transaction with a savepoint per entry.
+    Pass ?async=1 to get a 202 with a receipt ID right away; the entries are created by a
+    background worker and the results are read from getScoutingSyncStatus.
+    Entries may carry a client_entry_id (UUID); re-sending one returns the entry already created.
+    Every raw payload is appended to the payload journal so a time window can be replayed later.
+
+    The body may be JSON or MessagePack (Content-Type: application/msgpack), either one
+    optionally sent with Content-Encoding: gzip; the response comes back the same way.
+    Frappe parses application/json bodies itself before this runs, so gzipped JSON must be
+    sent with another Content-Type, e.g. application/octet-stream.
+
+    Uploads are admission-controlled: each device (X-Device-Id, else the user) has a token
+    bucket, and only a bounded number of uploads run at once across all workers. Refused
+    uploads get a 429 with a jittered Retry-After; the entries should be sent again then.
+    """
+    slot_token, rejection = admit_ingest_request()
+    if rejection:
+        message = ("Too many uploads from this device." if rejection["reason"] == "rate_limited"
+                   else "The server is busy processing other uploads.")
+        return make_sync_response(
+            {
+                "status": "error",
+                "reason": rejection["reason"],
+                "retry_after": rejection["retry_after"],
+                "message": f"{message} Retry in {rejection['retry_after']} seconds."
+            },
+            429,
+            headers={"Retry-After": str(rejection["retry_after"])}
+        )
+
+    try:
+        handle_scouting_upload()
+    finally:
+        release_ingest_slot(slot_token)
+
+    return make_sync_response(frappe.response.get("data"), frappe.response.get("http_status_code") or 200)
@@ -1,117 +1,58 @@
 import frappe
 
+from upande_scp.serverscripts.observation_catalog import get_observation_catalog
+
 @frappe.whitelist()
 def getObservationsDetails():
-    # Fetch all entities
-    pests = frappe.get_all(
-        "Pest",
-        fields=["name", "common_name"],
-        order_by="idx"
-    )
-
-    diseases = frappe.get_all(
-        "Plant Disease",
-        fields=["name", "common_name"],
-        order_by="idx"
-    )
-
-    disorders = frappe.get_all(
-        "Physiological Disorder",
-        fields=["name", "disorder_name", "photo", "reading_type", "plant_sections"],
-        order_by="idx"
-    )
-
-    weeds = frappe.get_all(
-        "Weed",
-        fields=["name", "name1", "reading_type", "plant_sections"],
-        order_by="idx"
-    )
-
-    incidents = frappe.get_all(
-        "Incident",
-        fields=["name", "name1", "reading_type", "plant_sections"],
-        order_by="idx"
-    )
-
-    predators = frappe.get_all(
-        "Predator",
-        fields=["name", "common_name"],
-        order_by="idx"
-    )
-
-    pest_names = [p.name for p in pests]
-    disease_names = [d.name for d in diseases]
-    predator_names = [p.name for p in predators]
-
-    # Fetch pest stages with reading_type and plant_sections for EACH stage
+    # Master records, stages and predator targets come from the shared catalog cache
+    catalog = get_observation_catalog()
+    pests = list(catalog["pests"].values())
+    diseases = list(catalog["diseases"].values())
+    disorders = list(catalog["physiological_disorders"].values())
+    weeds = list(catalog["weeds"].values())
+    incidents = list(catalog["incidents"].values())
+    predators = list(catalog["predators"].values())
+
+    # Pest stages with reading_type and plant_sections for EACH stage
     pest_stages = {}
-    if pest_names:
-        stages_data = frappe.get_all(
-            "Pests Stages",
-            filters={"parent": ["in", pest_names]},
-            fields=["parent", "stage", "reading_type", "plant_sections", "idx"],
-            order_by="parent, idx"
-        )
-        for stage in stages_data:
-            if stage.parent not in pest_stages:
-                pest_stages[stage.parent] = []
-            pest_stages[stage.parent].append({
-                "stage": stage.stage,
-                "reading_type": (stage.reading_type or "Count").lower(),
-                "plant_sections": _parse_plant_sections(stage.plant_sections)
-            })
-
-    # Fetch disease stages with reading_type, plant_sections, range_min, and range_max for EACH stage
+    for pest in pests:
+        pest_stages[pest["name"]] = [
+            {
+                "stage": stage["stage"],
+                "reading_type": (stage["reading_type"] or "Count").lower(),
+                "plant_sections": _parse_plant_sections(stage["plant_sections"])
+            }
+            for stage in pest["stages"]
+        ]
+
+    # Disease stages with reading_type, plant_sections, range_min, and range_max for EACH stage
     disease_stages = {}
-    if disease_names:
-        stages_data = frappe.get_all(
-            "Disease Stages",
-            filters={"parent": ["in", disease_names]},
-            fields=["parent", "stage", "reading_type", "plant_sections", "range_min", "range_max", "idx"],
-            order_by="parent, idx"
-        )
-        for stage in stages_data:
-            if stage.parent not in disease_stages:
-                disease_stages[stage.parent] = []
-            disease_stages[stage.parent].append({
-                "stage": stage.stage,
-                "reading_type": (stage.reading_type or "Count").lower(),
-                "plant_sections": _parse_plant_sections(stage.plant_sections),
-                "range_min": _to_float(stage.range_min),
-                "range_max": _to_float(stage.range_max)
-            })
-
-    # Fetch predator stages with reading_type and plant_sections for EACH stage
+    for disease in diseases:
+        disease_stages[disease["name"]] = [
+            {
+                "stage": stage["stage"],
+                "reading_type": (stage["reading_type"] or "Count").lower(),
+                "plant_sections": _parse_plant_sections(stage["plant_sections"]),
+                "range_min": _to_float(stage["range_min"]),
+                "range_max": _to_float(stage["range_max"])
+            }
+            for stage in disease["stages"]
+        ]
+
+    # Predator stages with reading_type and plant_sections for EACH stage
     predator_stages = {}
-    if predator_names:
-        stages_data = frappe.get_all(
-            "Predator Stages",
-            filters={"parent": ["in", predator_names]},
-            fields=["parent", "stage", "reading_type", "plant_sections", "idx"],
-            order_by="parent, idx"
-        )
-        for stage in stages_data:
-            if stage.parent not in predator_stages:
-                predator_stages[stage.parent] = []
-            predator_stages[stage.parent].append({
-                "stage": stage.stage,
-                "reading_type": (stage.reading_type or "Count").lower(),
-                "plant_sections": _parse_plant_sections(stage.plant_sections)
-            })
-
-    # Fetch predator targets
-    predator_targets = {}
-    if predator_names:
-        targets_data = frappe.get_all(
-            "Predator Targets",
-            filters={"parent": ["in", predator_names]},
-            fields=["parent", "pest", "idx"],
-            order_by="parent, idx"
-        )
-        for target in targets_data:
-            if target.parent not in predator_targets:
-                predator_targets[target.parent] = []
-            predator_targets[target.parent].append(target.pest)
+    for predator in predators:
+        predator_stages[predator["name"]] = [
+            {
+                "stage": stage["stage"],
+                "reading_type": (stage["reading_type"] or "Count").lower(),
+                "plant_sections": _parse_plant_sections(stage["plant_sections"])
+            }
+            for stage in predator["stages"]
+        ]
+
+    # Predator targets
+    predator_targets = {predator["name"]: predator["targets"] for predator in predators}
 
     # Build observation types - each stage is a separate field now
     observation_types = []
@@ -119,10 +60,10 @@ def getObservationsDetails():
     # PESTS - Create a field for each stage
     pest_fields = []
     for pest in pests:
-        stages = pest_stages.get(pest.name, [])
+        stages = pest_stages.get(pest["name"], [])
         for stage_info in stages:
             pest_fields.append({
-                "pestName": pest.common_name,
+                "pestName": pest["label"],
                 "stage": stage_info['stage'],
                 "readingType": stage_info['reading_type'],
                 "plantSections": stage_info['plant_sections'],
@@ -139,10 +80,10 @@ def getObservationsDetails():
     # DISEASES - Create a field for each stage with range_min and range_max
     disease_fields = []
     for disease in diseases:
-        stages = disease_stages.get(disease.name, [])
+        stages = disease_stages.get(disease["name"], [])
         for stage_info in stages:
             disease_fields.append({
-                "diseaseName": disease.common_name,
+                "diseaseName": disease["label"],
                 "stage": stage_info['stage'],
                 "readingType": stage_info['reading_type'],
                 "plantSections": stage_info['plant_sections'],
@@ -165,12 +106,12 @@ def getObservationsDetails():
             "type": "toggle",
             "fields": [
                 {
-                    "name": disorder.disorder_name,
+                    "name": disorder["label"],
                     "stage": None,
                     "stages": None,
-                    "photo": disorder.photo,
-                    "readingType": (disorder.reading_type or "Checkbox").lower(),
-                    "plantSections": _parse_plant_sections(disorder.plant_sections),
+                    "photo": disorder["photo"],
+                    "readingType": (disorder["reading_type"] or "Checkbox").lower(),
+                    "plantSections": _parse_plant_sections(disorder["plant_sections"]),
                 }
                 for disorder in disorders
             ]
@@ -183,11 +124,11 @@ def getObservationsDetails():
             "type": "toggle",
             "fields": [
                 {
-                    "name": weed.name1,
+                    "name": weed["label"],
                     "stage": None,
                     "stages": None,
-                    "readingType": (weed.reading_type or "Checkbox").lower(),
-                    "plantSections": _parse_plant_sections(weed.plant_sections),
+                    "readingType": (weed["reading_type"] or "Checkbox").lower(),
+                    "plantSections": _parse_plant_sections(weed["plant_sections"]),
                 }
                 for weed in weeds
             ]
@@ -200,11 +141,11 @@ def getObservationsDetails():
             "type": "toggle",
             "fields": [
                 {
-                    "name": incident.name1,
+                    "name": incident["label"],
                     "stage": None,
                     "stages": None,
-                    "readingType": (incident.reading_type or "Checkbox").lower(),
-                    "plantSections": _parse_plant_sections(incident.plant_sections),
+                    "readingType": (incident["reading_type"] or "Checkbox").lower(),
+                    "plantSections": _parse_plant_sections(incident["plant_sections"]),
                 }
                 for incident in incidents
             ]
@@ -213,15 +154,15 @@ def getObservationsDetails():
     # PREDATORS - Create a field for each stage
     predator_fields = []
     for predator in predators:
-        stages = predator_stages.get(predator.name, [])
+        stages = predator_stages.get(predator["name"], [])
         for stage_info in stages:
             predator_fields.append({
-                "predatorName": predator.common_name,
+                "predatorName": predator["label"],
                 "stage": stage_info['stage'],
                 "readingType": stage_info['reading_type'],
                 "plantSections": stage_info['plant_sections'],
                 "stages": None,
-                "targetPests": predator_targets.get(predator.name, [])
+                "targetPests": predator_targets.get(predator["name"], [])
             })
     
     if predator_fields:
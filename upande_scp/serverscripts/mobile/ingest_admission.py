@@ -0,0 +1,128 @@
+import math
+import random
+import time
+
+import frappe
+from frappe.utils import cint
+
+INGEST_SLOTS_KEY = "upande_scp:ingest_slots"
+INGEST_BUCKET_KEY = "upande_scp:ingest_bucket"
+
+# A slot left behind by a killed worker frees itself after this long (gunicorn's timeout is 120 s)
+SLOT_TTL_SECONDS = 180
+# Base Retry-After when every ingest slot is busy; clients get 1-2x this so retries spread out
+BUSY_RETRY_SECONDS = 5
+# Extra share of the computed wait added at random to a rate-limited Retry-After
+RETRY_JITTER = 0.5
+
+DEFAULT_DEVICE_BURST = 10
+
+# KEYS[1] slot set (member = request token, score = expiry); ARGV now, ttl, limit, token
+ACQUIRE_SLOT_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[3]) then
+    redis.call('ZADD', KEYS[1], tonumber(ARGV[1]) + tonumber(ARGV[2]), ARGV[4])
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+# KEYS[1] bucket hash; ARGV now, refill per second, capacity. Returns the wait in seconds, "0" when admitted.
+TAKE_TOKEN_SCRIPT = """
+local now = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local capacity = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+
+def get_ingest_limits():
+    """(max concurrent uploads, per-device refill per minute, per-device burst) from Map Settings."""
+    settings = frappe.get_cached_doc("Map Settings")
+    max_concurrent = cint(settings.get("ingest_max_concurrent"))
+    if not max_concurrent:
+        # Leave at least half the web workers for Desk and the map pages
+        max_concurrent = max(1, cint(frappe.conf.get("gunicorn_workers") or 4) // 2)
+
+    # 0 turns the per-device limit off
+    rate = cint(settings.get("ingest_device_rate_per_minute"))
+    burst = cint(settings.get("ingest_device_burst") or DEFAULT_DEVICE_BURST)
+    return max_concurrent, rate, burst
+
+
+def get_device_id():
+    """The syncing device, from X-Device-Id, falling back to the logged-in user."""
+    device_id = frappe.request and frappe.request.headers.get("X-Device-Id")
+    return (device_id or frappe.session.user)[:140]
+
+
+def jittered(seconds, spread):
+    """Whole seconds to wait: seconds plus up to spread x seconds of random jitter, at least 1."""
+    return max(1, math.ceil(seconds * (1 + random.uniform(0, spread))))
+
+
+def take_device_token(device_id, rate_per_minute, burst):
+    """Takes one token from the device's bucket; returns 0 when admitted, else the seconds to wait."""
+    cache = frappe.cache()
+    take_token = cache.register_script(TAKE_TOKEN_SCRIPT)
+    wait = take_token(
+        keys=[cache.make_key(f"{INGEST_BUCKET_KEY}:{device_id}")],
+        args=[time.time(), rate_per_minute / 60, burst],
+    )
+    return float(wait)
+
+
+def acquire_ingest_slot(max_concurrent):
+    """Claims one of the shared ingest slots; returns its token, or None when all are busy."""
+    cache = frappe.cache()
+    acquire = cache.register_script(ACQUIRE_SLOT_SCRIPT)
+    token = frappe.generate_hash(length=16)
+    admitted = acquire(
+        keys=[cache.make_key(INGEST_SLOTS_KEY)],
+        args=[time.time(), SLOT_TTL_SECONDS, max_concurrent, token],
+    )
+    return token if cint(admitted) else None
+
+
+def release_ingest_slot(token):
+    if token:
+        cache = frappe.cache()
+        cache.execute_command("ZREM", cache.make_key(INGEST_SLOTS_KEY), token)
+
+
+def admit_ingest_request():
+    """
+    Admission control for createScoutingEntry.
+    Returns (slot_token, None) when the upload may run, or (None, rejection) where rejection
+    is {"reason", "retry_after"}. The device's rate limit is checked before a slot is claimed,
+    so a throttled device never holds one. Redis errors admit the request without a slot.
+    """
+    try:
+        max_concurrent, rate_per_minute, burst = get_ingest_limits()
+
+        if rate_per_minute > 0:
+            wait = take_device_token(get_device_id(), rate_per_minute, burst)
+            if wait > 0:
+                return None, {"reason": "rate_limited", "retry_after": jittered(wait, RETRY_JITTER)}
+
+        token = acquire_ingest_slot(max_concurrent)
+        if not token:
+            return None, {"reason": "busy", "retry_after": jittered(BUSY_RETRY_SECONDS, 1)}
+        return token, None
+
+    except Exception as e:
+        frappe.log_error("Ingest admission control failed", str(e))
+        return None, None
@@ -0,0 +1,171 @@
+import fcntl
+import gzip
+import json
+import os
+import zlib
+from datetime import timedelta
+
+import frappe
+from frappe.utils import add_days, cint, get_datetime, getdate, now_datetime
+
+# Under the site's private files: <site>/private/scouting_payload_journal/YYYY-MM-DD.jsonl.gz
+JOURNAL_DIR = "scouting_payload_journal"
+JOURNAL_SUFFIX = ".jsonl.gz"
+DEFAULT_RETENTION_DAYS = 90
+# Start of every gzip member: magic bytes and the deflate method
+GZIP_MAGIC = b"\x1f\x8b\x08"
+
+
+def get_journal_dir():
+    path = frappe.get_site_path("private", JOURNAL_DIR)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def get_journal_path(day):
+    return os.path.join(get_journal_dir(), f"{getdate(day).isoformat()}{JOURNAL_SUFFIX}")
+
+
+def journal_payload(data, bulk=False, mode="sync"):
+    """
+    Appends one raw ingest payload to today's journal file and returns its journal ID.
+    Each payload is written as its own gzip member in a single append, so the day file
+    stays a valid gzip stream of JSON lines without rewriting anything already on disk.
+    """
+    received_at = now_datetime()
+    record = {
+        "id": frappe.generate_hash(length=12),
+        "received_at": received_at.isoformat(),
+        "user": frappe.session.user,
+        "mode": mode,
+        "bulk": cint(bulk),
+        "payload": data,
+    }
+    chunk = gzip.compress((json.dumps(record, default=str, separators=(",", ":")) + "\n").encode())
+
+    with open(get_journal_path(received_at), "ab") as journal:
+        # Several workers append to the same day file
+        fcntl.flock(journal, fcntl.LOCK_EX)
+        try:
+            journal.write(chunk)
+        finally:
+            fcntl.flock(journal, fcntl.LOCK_UN)
+
+    return record["id"]
+
+
+def read_journal_file(path):
+    """
+    Yields the records of one day file, decoding it gzip member by member. A damaged member
+    (a worker killed mid-append leaves a truncated one, later appends follow it) is skipped
+    by resuming at the next gzip header, so the records after it are still read.
+    """
+    try:
+        with open(path, "rb") as journal:
+            data = journal.read()
+    except OSError:
+        frappe.log_error("Unreadable scouting payload journal", path)
+        return
+
+    damaged = 0
+    while data:
+        member = zlib.decompressobj(wbits=31)
+        try:
+            text = member.decompress(data) + member.flush()
+        except zlib.error:
+            text = None
+        if text is None or not member.eof:
+            # Damaged or truncated member: resync on the next gzip header
+            damaged += 1
+            next_member = data.find(GZIP_MAGIC, 1)
+            if next_member < 0:
+                break
+            data = data[next_member:]
+            continue
+        data = member.unused_data
+
+        for line in text.decode(errors="replace").splitlines():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                damaged += 1
+
+    if damaged:
+        frappe.log_error("Damaged scouting payload journal", f"{path}: skipped {damaged} damaged part(s)")
+
+
+def read_journal(from_datetime, to_datetime=None):
+    """Yields the journal records received between from_datetime and to_datetime, oldest first."""
+    from_datetime = get_datetime(from_datetime)
+    to_datetime = get_datetime(to_datetime) if to_datetime else now_datetime()
+
+    day = getdate(from_datetime)
+    while day <= getdate(to_datetime):
+        path = get_journal_path(day)
+        day += timedelta(days=1)
+        if not os.path.exists(path):
+            continue
+
+        for record in read_journal_file(path):
+            if from_datetime <= get_datetime(record["received_at"]) <= to_datetime:
+                yield record
+
+
+def get_retention_days():
+    return cint(frappe.db.get_single_value("Map Settings", "payload_journal_retention_days")) or DEFAULT_RETENTION_DAYS
+
+
+def purge_payload_journal():
+    """Daily job: deletes journal day files older than the retention period."""
+    cutoff = add_days(getdate(), -get_retention_days())
+    journal_dir = get_journal_dir()
+
+    for filename in os.listdir(journal_dir):
+        if not filename.endswith(JOURNAL_SUFFIX):
+            continue
+        try:
+            day = getdate(filename[: -len(JOURNAL_SUFFIX)])
+        except Exception:
+            continue
+        if day < cutoff:
+            os.remove(os.path.join(journal_dir, filename))
+
+
+def replay_payload_journal(from_datetime, to_datetime=None, bulk=None, dry_run=False):
+    """
+    Re-runs ingest for every payload journalled in a time window, as the user who sent it.
+    Entries already created are matched by client_entry_id or the duplicate check,
+    so a replay after a fix only fills in what failed the first time.
+    Returns a summary of the payloads and entry results.
+    """
+    from upande_scp.serverscripts.mobile.create_scouting_entry import ingest_scouting_entries
+
+    summary = {"payloads": 0, "entries": 0, "success": 0, "error": 0, "existing": 0, "journal_ids": []}
+    original_user = frappe.session.user
+
+    try:
+        for record in read_journal(from_datetime, to_datetime):
+            data = record["payload"]
+            data_list = [data] if isinstance(data, dict) else data
+            if not isinstance(data_list, list):
+                continue
+
+            summary["payloads"] += 1
+            summary["entries"] += len(data_list)
+            summary["journal_ids"].append(record["id"])
+            if dry_run:
+                continue
+
+            frappe.set_user(record["user"])
+            replay_bulk = record.get("bulk") if bulk is None else bulk
+            for result in ingest_scouting_entries(data_list, bulk=cint(replay_bulk)):
+                if result.get("status") == "success":
+                    summary["success"] += 1
+                    if result.get("existing"):
+                        summary["existing"] += 1
+                else:
+                    summary["error"] += 1
+    finally:
+        frappe.set_user(original_user)
+
+    return summary
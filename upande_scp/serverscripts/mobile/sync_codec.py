@@ -0,0 +1,126 @@
+import gzip
+import json
+import zlib
+
+import frappe
+import msgpack
+from werkzeug.wrappers import Response
+
+MSGPACK_MIMETYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+JSON_FORMAT = "json"
+MSGPACK_FORMAT = "msgpack"
+
+# Compressed body bytes handed to the decoder at a time
+BODY_CHUNK_SIZE = 64 * 1024
+# Refuse gzip bodies that inflate past this (decompression bombs)
+MAX_DECOMPRESSED_BYTES = 64 * 1024 * 1024
+
+
+def get_sync_format(request=None):
+    """(format, gzipped) of a sync request body, from its Content-Type and Content-Encoding."""
+    request = request or frappe.request
+    body_format = MSGPACK_FORMAT if request.mimetype in MSGPACK_MIMETYPES else JSON_FORMAT
+    encoding = (request.headers.get("Content-Encoding") or "").strip().lower()
+    if encoding and encoding not in ("gzip", "identity"):
+        raise ValueError(f"Unsupported Content-Encoding: {encoding}")
+    return body_format, encoding == "gzip"
+
+
+def iter_body_chunks(body, gzipped):
+    """
+    Yields the request body in chunks, inflating gzip as it goes.
+    The compressed body is sliced through a memoryview and never joined back into one
+    decompressed buffer.
+    """
+    view = memoryview(body)
+    inflater = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+    total = 0
+
+    for start in range(0, len(view), BODY_CHUNK_SIZE):
+        chunk = view[start:start + BODY_CHUNK_SIZE]
+        if inflater is None:
+            yield chunk
+            continue
+
+        while chunk:
+            try:
+                inflated = inflater.decompress(chunk, BODY_CHUNK_SIZE)
+            except zlib.error as e:
+                raise ValueError(f"Invalid gzip request body: {e}") from e
+            total += len(inflated)
+            if total > MAX_DECOMPRESSED_BYTES:
+                raise ValueError("Decompressed request body is too large.")
+            if inflated:
+                yield inflated
+            chunk = inflater.unconsumed_tail
+
+    if inflater is not None:
+        if not inflater.eof:
+            raise ValueError("Truncated gzip request body.")
+        tail = inflater.flush()
+        if tail:
+            yield tail
+
+
+def read_sync_body(request=None):
+    """
+    Decodes a sync request body: JSON or MessagePack, optionally gzip-compressed.
+    MessagePack is unpacked from the inflated chunks as they arrive; JSON has no
+    incremental parser, so its chunks are gathered into a single buffer first.
+    Raises ValueError when the body cannot be decoded.
+    """
+    request = request or frappe.request
+    body_format, gzipped = get_sync_format(request)
+
+    # Frappe has already read (and cached) the body while building form_dict
+    body = request.get_data(cache=True)
+    if not body:
+        return None
+
+    if not gzipped and body_format == JSON_FORMAT:
+        return json.loads(body)
+
+    if body_format == MSGPACK_FORMAT:
+        unpacker = msgpack.Unpacker(raw=False, max_buffer_size=MAX_DECOMPRESSED_BYTES)
+        try:
+            for chunk in iter_body_chunks(body, gzipped):
+                unpacker.feed(chunk)
+            objects = list(unpacker)
+        except msgpack.UnpackException as e:
+            raise ValueError(f"Invalid MessagePack request body: {e}") from e
+        if len(objects) != 1:
+            raise ValueError("Expected exactly one MessagePack object in the request body.")
+        return objects[0]
+
+    buffer = bytearray()
+    for chunk in iter_body_chunks(body, gzipped):
+        buffer += chunk
+    return json.loads(buffer)
+
+
+def make_sync_response(data, status, request=None, headers=None):
+    """
+    Response in the format and encoding the request came in, or None for plain JSON
+    without extra headers so Frappe renders frappe.response as usual.
+    """
+    request = request or frappe.request
+    try:
+        body_format, gzipped = get_sync_format(request)
+    except ValueError:
+        body_format, gzipped = JSON_FORMAT, False
+    if body_format == JSON_FORMAT and not gzipped and not headers:
+        return None
+
+    if body_format == MSGPACK_FORMAT:
+        body = msgpack.packb({"data": data}, default=str, use_bin_type=True)
+        mimetype = "application/msgpack"
+    else:
+        body = json.dumps({"data": data}, default=str, separators=(",", ":")).encode()
+        mimetype = "application/json"
+
+    headers = {**(headers or {}), "Vary": "Content-Type, Content-Encoding"}
+    if gzipped:
+        body = gzip.compress(body, compresslevel=6)
+        headers["Content-Encoding"] = "gzip"
+
+    return Response(body, status=status, mimetype=mimetype, headers=headers)
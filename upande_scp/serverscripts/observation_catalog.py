@@ -0,0 +1,145 @@
+import frappe
+
+OBSERVATION_CATALOG_CACHE_KEY = "upande_scp:observation_catalog"
+OBSERVATION_CATALOG_VERSION_KEY = "upande_scp:observation_catalog_version"
+
+# observation type -> doctype, label field, legend colour field, extra fields
+CATALOG_DOCTYPES = {
+    "pests": ("Pest", "common_name", "pests_legend_color", []),
+    "diseases": ("Plant Disease", "common_name", "disease_legend_color", []),
+    "predators": ("Predator", "common_name", "predator_legend_color", []),
+    "weeds": ("Weed", "name1", None, ["reading_type", "plant_sections", "photo"]),
+    "incidents": ("Incident", "name1", None, ["reading_type", "plant_sections"]),
+    "physiological_disorders": (
+        "Physiological Disorder", "disorder_name", None, ["reading_type", "plant_sections", "photo"]
+    ),
+}
+
+# observation type -> stage child doctype and its fields
+CATALOG_STAGES = {
+    "pests": ("Pests Stages", ["stage", "symbol", "reading_type", "plant_sections"]),
+    "diseases": ("Disease Stages", ["stage", "symbol", "reading_type", "plant_sections", "range_min", "range_max"]),
+    "predators": ("Predator Stages", ["stage", "reading_type", "plant_sections"]),
+}
+
+# (version, catalog) loaded by this worker
+_local_catalog = None
+
+
+def build_observation_catalog():
+    """
+    {observation type: {name: record}} for every observation the scouts can record, in idx order.
+    A record carries its label, legend colour (None when unset), stages and severity scale;
+    predators also list their target pests.
+    """
+    catalog = {}
+    type_by_doctype = {}
+    for observation_type, (doctype, label_field, color_field, extra_fields) in CATALOG_DOCTYPES.items():
+        type_by_doctype[doctype] = observation_type
+        fields = ["name", label_field, *extra_fields]
+        if color_field:
+            fields.append(color_field)
+
+        catalog[observation_type] = {}
+        for row in frappe.get_all(doctype, fields=fields, order_by="idx asc"):
+            record = {
+                "name": row.name,
+                "label": row.get(label_field) or row.name,
+                "color": row.get(color_field) if color_field else None,
+                "stages": [],
+                "severity": [],
+            }
+            for field in extra_fields:
+                record[field] = row.get(field)
+            if observation_type == "predators":
+                record["targets"] = []
+            catalog[observation_type][row.name] = record
+
+    for observation_type, (stage_doctype, stage_fields) in CATALOG_STAGES.items():
+        records = catalog[observation_type]
+        for stage in frappe.get_all(
+            stage_doctype,
+            filters={"parenttype": CATALOG_DOCTYPES[observation_type][0]},
+            fields=["parent", *stage_fields],
+            order_by="parent asc, idx asc",
+        ):
+            if stage.parent in records:
+                records[stage.parent]["stages"].append({field: stage.get(field) for field in stage_fields})
+
+    for severity in frappe.get_all(
+        "Scouting Severity Scale",
+        filters={"parenttype": ["in", ["Pest", "Plant Disease"]]},
+        fields=["parenttype", "parent", "severity", "from", "to", "color"],
+        order_by="parent asc, idx asc",
+    ):
+        records = catalog[type_by_doctype[severity.parenttype]]
+        if severity.parent in records:
+            records[severity.parent]["severity"].append({
+                "severity": severity.severity,
+                "from": severity.get("from"),
+                "to": severity.get("to"),
+                "color": severity.color,
+            })
+
+    for target in frappe.get_all(
+        "Predator Targets",
+        filters={"parenttype": "Predator"},
+        fields=["parent", "pest"],
+        order_by="parent asc, idx asc",
+    ):
+        if target.parent in catalog["predators"]:
+            catalog["predators"][target.parent]["targets"].append(target.pest)
+
+    return catalog
+
+
+def get_observation_catalog_version():
+    cache = frappe.cache()
+    version = cache.get_value(OBSERVATION_CATALOG_VERSION_KEY)
+    if version is None:
+        version = frappe.generate_hash(length=10)
+        cache.set_value(OBSERVATION_CATALOG_VERSION_KEY, version)
+    return version
+
+
+def get_observation_catalog():
+    """Returns the observation catalog from this worker, Redis, or the database."""
+    global _local_catalog
+    version = get_observation_catalog_version()
+
+    if _local_catalog and _local_catalog[0] == version:
+        return _local_catalog[1]
+
+    cache = frappe.cache()
+    payload = cache.get_value(OBSERVATION_CATALOG_CACHE_KEY)
+    if payload and payload.get("version") == version:
+        catalog = payload["catalog"]
+    else:
+        catalog = build_observation_catalog()
+        cache.set_value(OBSERVATION_CATALOG_CACHE_KEY, {"version": version, "catalog": catalog})
+
+    _local_catalog = (version, catalog)
+    return catalog
+
+
+def get_legend_color(observation_type, name):
+    """Legend colour set on an observation's master record, or None."""
+    record = get_observation_catalog().get(observation_type, {}).get(name)
+    return record["color"] if record else None
+
+
+def bump_observation_catalog_version():
+    global _local_catalog
+    cache = frappe.cache()
+    cache.set_value(OBSERVATION_CATALOG_VERSION_KEY, frappe.generate_hash(length=10))
+    cache.delete_value(OBSERVATION_CATALOG_CACHE_KEY)
+    _local_catalog = None
+
+
+def invalidate_observation_catalog(doc=None, method=None, *args):
+    """
+    doc_events handler for the observation doctypes: the next request rebuilds the catalog.
+    The version moves again after commit, so a rebuild that read the old rows in between is dropped.
+    """
+    bump_observation_catalog_version()
+    frappe.db.after_commit.add(bump_observation_catalog_version)
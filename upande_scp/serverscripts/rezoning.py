@@ -0,0 +1,217 @@
+import time
+
+import frappe
+from frappe.utils import cint, flt, now_datetime
+from frappe.utils.background_jobs import is_job_enqueued
+
+from upande_scp.serverscripts.scouting_rollup import move_rollup_zones
+from upande_scp.serverscripts.zone_index import get_zone_index
+
+REZONING_STATE_KEY = "upande_scp:rezoning"
+
+# Accuracy assumed for entries captured without a GPS accuracy
+DEFAULT_ACCURACY_M = 5.0
+
+# A running job that has not finished a chunk for this long is treated as dead
+REZONING_STALE_SECONDS = 15 * 60
+
+
+def get_rezoning_job_id(greenhouse, from_date, to_date):
+    return f"rezoning::{greenhouse}::{from_date}::{to_date}"
+
+
+def get_rezoning_state(job_id):
+    return frappe.cache().hget(REZONING_STATE_KEY, job_id)
+
+
+def set_rezoning_state(job_id, state):
+    state["heartbeat"] = time.time()
+    frappe.cache().hset(REZONING_STATE_KEY, job_id, state)
+    frappe.publish_realtime("rezoning_progress", {"job_id": job_id, **state}, user=state.get("user"))
+
+
+def is_rezoning_alive(job_id, state):
+    """
+    Whether a Queued or Running state still has a job behind it. A job killed by its timeout
+    leaves RQ; one lost with its worker can stay "started" in RQ, so Running also needs a
+    recent heartbeat.
+    """
+    if state.get("status") not in ("Queued", "Running") or not is_job_enqueued(job_id):
+        return False
+    if state.get("status") == "Running":
+        return time.time() - flt(state.get("heartbeat")) < REZONING_STALE_SECONDS
+    return True
+
+
+@frappe.whitelist()
+def enqueueRezoning(greenhouse, from_date, to_date, chunk_size=500, pause_seconds=0.2, restart=0):
+    """
+    Queues a re-zoning of historical Scouting Entries for a greenhouse and date range.
+    Calling it again for the same range resumes from the last committed chunk
+    unless restart is set, also after the previous job died without finishing.
+    """
+    frappe.only_for("System Manager")
+
+    job_id = get_rezoning_job_id(greenhouse, from_date, to_date)
+    state = get_rezoning_state(job_id)
+
+    if state and is_rezoning_alive(job_id, state):
+        return {"job_id": job_id, **state}
+    # A dead job may still be listed as started in RQ, which would swallow a deduplicated enqueue
+    stale = bool(state and state.get("status") in ("Queued", "Running"))
+
+    if not state or cint(restart) or state.get("status") == "Completed":
+        state = {
+            "greenhouse": greenhouse,
+            "from_date": from_date,
+            "to_date": to_date,
+            "cursor": "",
+            "processed": 0,
+            "updated": 0,
+            "total": frappe.db.count("Scouting Entry", get_rezoning_filters(greenhouse, from_date, to_date)),
+        }
+
+    state.update({"status": "Queued", "user": frappe.session.user, "error": None})
+    set_rezoning_state(job_id, state)
+
+    frappe.enqueue(
+        "upande_scp.serverscripts.rezoning.rezone_entries",
+        queue="long",
+        timeout=4 * 3600,
+        job_id=job_id,
+        deduplicate=not stale,
+        rezoning_job_id=job_id,
+        chunk_size=cint(chunk_size) or 500,
+        pause_seconds=flt(pause_seconds),
+    )
+
+    return {"job_id": job_id, **state}
+
+
+@frappe.whitelist()
+def getRezoningStatus(job_id):
+    frappe.only_for("System Manager")
+    return get_rezoning_state(job_id) or {"status": "Not Found"}
+
+
+def get_rezoning_filters(greenhouse, from_date, to_date):
+    return {
+        "greenhouse": greenhouse,
+        "date_of_capture": ["between", [from_date, to_date]],
+        "latitude": ["is", "set"],
+        "longitude": ["is", "set"],
+    }
+
+
+def rezone_entries(rezoning_job_id, chunk_size=500, pause_seconds=0.2):
+    """
+    Background job: walks the entries in name order, one committed chunk at a time,
+    so row locks are only held for a single chunk's UPDATE.
+    """
+    state = get_rezoning_state(rezoning_job_id)
+    if not state:
+        return
+
+    state["status"] = "Running"
+    state["started_at"] = str(now_datetime())
+    set_rezoning_state(rezoning_job_id, state)
+
+    try:
+        zone_index = get_zone_index(state["greenhouse"])
+        filters = get_rezoning_filters(state["greenhouse"], state["from_date"], state["to_date"])
+
+        while True:
+            chunk_filters = dict(filters)
+            if state["cursor"]:
+                chunk_filters["name"] = [">", state["cursor"]]
+
+            entries = frappe.get_all(
+                "Scouting Entry",
+                filters=chunk_filters,
+                fields=["name", "bed", "zone", "latitude", "longitude", "gps_accuracy", "calculated_zone"],
+                order_by="name asc",
+                limit_page_length=chunk_size
+            )
+            if not entries:
+                break
+
+            state["updated"] = state["updated"] + rezone_chunk(zone_index, entries)
+            frappe.db.commit()
+
+            state["cursor"] = entries[-1].name
+            state["processed"] = state["processed"] + len(entries)
+            set_rezoning_state(rezoning_job_id, state)
+
+            if pause_seconds:
+                # Give daytime writers a chance at the table between chunks
+                time.sleep(pause_seconds)
+
+        state["status"] = "Completed"
+        state["completed_at"] = str(now_datetime())
+
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.log_error(frappe.get_traceback(), "Rezoning Error")
+        state["status"] = "Failed"
+        state["error"] = str(e)
+
+    set_rezoning_state(rezoning_job_id, state)
+
+
+def rezone_chunk(zone_index, entries):
+    """Re-matches one chunk of entries and writes back only the zones that changed."""
+    rows = []
+    for entry in entries:
+        try:
+            lat, lon = float(entry.latitude), float(entry.longitude)
+        except (TypeError, ValueError):
+            continue
+        rows.append((entry, lat, lon, entry.gps_accuracy or DEFAULT_ACCURACY_M))
+
+    if not rows:
+        return 0
+
+    zones, distances, confidences = zone_index.locate_batch(
+        [lat for _, lat, _, _ in rows],
+        [lon for _, _, lon, _ in rows],
+        [accuracy for _, _, _, accuracy in rows],
+        [entry.bed for entry, _, _, _ in rows]
+    )
+
+    entry_updates = []
+    zone_moves = {}
+    for row, (entry, _, _, _) in enumerate(rows):
+        zone = zones[row]
+        if not zone or (zone == entry.zone and zone == entry.calculated_zone):
+            continue
+        if zone != entry.zone:
+            zone_moves[entry.name] = (entry.zone, zone)
+        entry_updates.append((entry.name, zone, float(confidences[row]), round(float(distances[row]), 1)))
+
+    bulk_update_zones(entry_updates)
+    # The raw UPDATE skips the Scouting Entry hooks, so move the entries' rollup counts here
+    move_rollup_zones(zone_moves)
+
+    return len(zone_moves)
+
+
+def bulk_update_zones(entry_updates):
+    """Single UPDATE ... CASE statement for the zone and GPS match columns of a chunk of entries."""
+    if not entry_updates:
+        return
+
+    names = [u[0] for u in entry_updates]
+    cases = " ".join(["WHEN %s THEN %s"] * len(names))
+    zone_values = [v for name, zone, _, _ in entry_updates for v in (name, zone)]
+    confidence_values = [v for name, _, confidence, _ in entry_updates for v in (name, confidence)]
+    distance_values = [v for name, _, _, distance in entry_updates for v in (name, distance)]
+
+    frappe.db.sql(
+        f"""UPDATE `tabScouting Entry`
+        SET `zone` = CASE `name` {cases} END,
+            `calculated_zone` = CASE `name` {cases} END,
+            `gps_confidence` = CASE `name` {cases} END,
+            `distance` = CASE `name` {cases} END
+        WHERE `name` IN ({", ".join(["%s"] * len(names))})""",
+        zone_values + zone_values + confidence_values + distance_values + names
+    )
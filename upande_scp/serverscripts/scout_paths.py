@@ -0,0 +1,170 @@
+import frappe
+import numpy as np
+from frappe.utils import flt, get_datetime, to_timedelta
+
+from upande_scp.serverscripts.zone_index import local_plane_project
+
+# Points closer than this to the last kept point are treated as GPS jitter
+DEFAULT_JITTER_M = 3.0
+# Douglas-Peucker tolerance for the simplified walk line
+DEFAULT_TOLERANCE_M = 1.0
+POLYLINE_PRECISION = 5
+
+
+def encode_polyline(latitudes, longitudes, precision=POLYLINE_PRECISION):
+    """Google encoded polyline (lat, lng order) for a sequence of coordinates."""
+    factor = 10**precision
+    values = np.column_stack([
+        np.round(np.asarray(latitudes, dtype=float) * factor),
+        np.round(np.asarray(longitudes, dtype=float) * factor),
+    ]).astype(np.int64)
+    deltas = np.diff(values, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+
+    encoded = []
+    for delta in deltas.tolist():
+        value = ~(delta << 1) if delta < 0 else delta << 1
+        while value >= 0x20:
+            encoded.append(chr((0x20 | (value & 0x1F)) + 63))
+            value >>= 5
+        encoded.append(chr(value + 63))
+    return "".join(encoded)
+
+
+def remove_jitter(east, north, jitter_m):
+    """Indexes of the points kept after dropping those within jitter_m of the last kept point."""
+    kept = [0]
+    last_e, last_n = east[0], north[0]
+    for i in range(1, len(east)):
+        if np.hypot(east[i] - last_e, north[i] - last_n) >= jitter_m:
+            kept.append(i)
+            last_e, last_n = east[i], north[i]
+
+    # Always keep where the scout ended up
+    if kept[-1] != len(east) - 1:
+        kept.append(len(east) - 1)
+    return np.asarray(kept, dtype=int)
+
+
+def simplify_path(east, north, tolerance_m):
+    """Douglas-Peucker on planar metres; returns the indexes of the vertices kept."""
+    count = len(east)
+    if count < 3 or not tolerance_m:
+        return np.arange(count)
+
+    points = np.column_stack([east, north])
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+
+        start, end = points[first], points[last]
+        segment = end - start
+        length = np.hypot(*segment)
+        inner = points[first + 1:last] - start
+        if length:
+            distances = np.abs(segment[0] * inner[:, 1] - segment[1] * inner[:, 0]) / length
+        else:
+            distances = np.hypot(inner[:, 0], inner[:, 1])
+
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance_m:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+
+    return np.flatnonzero(keep)
+
+
+def build_scout_path(points, jitter_m=DEFAULT_JITTER_M, tolerance_m=DEFAULT_TOLERANCE_M):
+    """
+    Turns (datetime, latitude, longitude) points into one simplified walk.
+    Returns the encoded polyline, the start time, and per-vertex offsets in seconds from the start.
+    """
+    points = sorted(points, key=lambda p: p[0])
+    if not points:
+        return None
+
+    times = [p[0] for p in points]
+    lats = np.asarray([p[1] for p in points], dtype=float)
+    lons = np.asarray([p[2] for p in points], dtype=float)
+
+    east, north = local_plane_project(lons, lats, (float(lats[0]), float(lons[0])))
+    east, north = np.atleast_1d(east), np.atleast_1d(north)
+
+    rows = remove_jitter(east, north, jitter_m)
+    rows = rows[simplify_path(east[rows], north[rows], tolerance_m)]
+
+    start = times[0]
+    return {
+        "polyline": encode_polyline(lats[rows], lons[rows]),
+        "start": str(start),
+        "offsets": [int((times[row] - start).total_seconds()) for row in rows.tolist()],
+        "points": len(points),
+    }
+
+
+def entry_capture_time(entry):
+    """Capture datetime of a Scouting Entry row, falling back to its creation time."""
+    if entry.get("date_of_capture") and entry.get("time_of_capture") is not None:
+        return get_datetime(entry.date_of_capture) + to_timedelta(entry.time_of_capture)
+    return get_datetime(entry.get("creation"))
+
+
+def build_scout_paths(entries, jitter_m=DEFAULT_JITTER_M, tolerance_m=DEFAULT_TOLERANCE_M):
+    """Groups Scouting Entry rows by scouts_name and returns one simplified path per scout."""
+    points_by_scout = {}
+    for entry in entries:
+        try:
+            lat, lon = float(entry.latitude), float(entry.longitude)
+        except (TypeError, ValueError):
+            continue
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180) or (lat == 0 and lon == 0):
+            continue
+        points_by_scout.setdefault(entry.scouts_name, []).append((entry_capture_time(entry), lat, lon))
+
+    paths = []
+    for scout_name, points in points_by_scout.items():
+        path = build_scout_path(points, jitter_m, tolerance_m)
+        if path:
+            paths.append({"name": scout_name, **path})
+    return paths
+
+
+@frappe.whitelist()
+def getScoutPaths(from_date, to_date=None, greenhouse=None, scout=None,
+                  jitter_m=DEFAULT_JITTER_M, tolerance_m=DEFAULT_TOLERANCE_M):
+    """Simplified, polyline-encoded scout walks over a date range, for multi-day movement views."""
+    filters = {
+        "date_of_capture": ["between", [from_date, to_date or from_date]],
+        "latitude": ["is", "set"],
+        "longitude": ["is", "set"],
+    }
+    if greenhouse:
+        filters["greenhouse"] = greenhouse
+    if scout:
+        filters["scouts_name"] = scout
+
+    entries = frappe.get_all(
+        "Scouting Entry",
+        filters=filters,
+        fields=["scouts_name", "date_of_capture", "time_of_capture", "creation", "latitude", "longitude"]
+    )
+
+    employee_names = dict(frappe.get_all(
+        "Employee",
+        filters={"name": ["in", list({e.scouts_name for e in entries})]},
+        fields=["name", "employee_name"],
+        as_list=True
+    )) if entries else {}
+
+    paths = build_scout_paths(entries, flt(jitter_m), flt(tolerance_m))
+    for path in paths:
+        path["employee"] = path["name"]
+        path["name"] = employee_names.get(path["name"], path["name"])
+
+    return {"scout_paths": paths, "polyline_precision": POLYLINE_PRECISION}
@@ -0,0 +1,242 @@
+import frappe
+from frappe import _
+from frappe.utils import add_days, cint, flt, getdate, now
+
+from upande_scp.serverscripts.heatmap_grid import DEFAULT_STAGE, OBSERVATION_TABLES
+
+# observation type -> (child table, parentfield, observation link field, has stage, has count)
+ROLLUP_TABLES = {
+    **OBSERVATION_TABLES,
+    "traps": ("Trap Scouting Entry", "trap_scouting_entry", "pest", False, True),
+}
+
+ROLLUP_KEY_FIELDS = ["date", "greenhouse", "bed", "zone", "observation_type", "observation", "stage"]
+ROLLUP_COLUMNS = ["name", "creation", "modified", "owner", "modified_by", *ROLLUP_KEY_FIELDS, "count", "presence"]
+
+# The rebuild recomputes and commits this many days at a time
+ROLLUP_CHUNK_DAYS = 31
+
+# getScoutingRollup level -> location fields rows are grouped by
+ROLLUP_LEVELS = {
+    "greenhouse": ["greenhouse"],
+    "bed": ["greenhouse", "bed"],
+    "zone": ["greenhouse", "bed", "zone"],
+}
+
+
+def get_rollup_contributions(doc):
+    """{rollup key: [count, presence]} that one Scouting Entry adds to the rollup."""
+    contributions = {}
+    if not doc.get("date_of_capture"):
+        return contributions
+
+    location = (
+        getdate(doc.date_of_capture), doc.get("greenhouse") or "", doc.get("bed") or "", doc.get("zone") or ""
+    )
+    for observation_type, (_table, parentfield, field, has_stage, has_count) in ROLLUP_TABLES.items():
+        for row in doc.get(parentfield) or []:
+            observation = row.get(field)
+            if not observation:
+                continue
+            stage = (row.get("stage") if has_stage else None) or DEFAULT_STAGE
+            # Same rule as the heatmaps: a row with no count counts once
+            value = (flt(row.get("count")) or 1) if has_count else 1
+
+            totals = contributions.setdefault((*location, observation_type, observation, stage), [0.0, 0])
+            totals[0] += value
+            totals[1] += 1
+    return contributions
+
+
+def apply_rollup_deltas(deltas):
+    """
+    Adds (key..., count, presence) deltas to the rollup in one upsert, then drops the
+    rows of the touched days whose last observation went away.
+    The upsert is MariaDB's ON DUPLICATE KEY UPDATE; Postgres sites are not supported.
+    """
+    if not deltas:
+        return
+
+    timestamp, user = now(), frappe.session.user
+    # Sorted so concurrent syncs lock rows in the same order
+    values = [
+        (frappe.generate_hash(length=10), timestamp, timestamp, user, user, *delta) for delta in sorted(deltas)
+    ]
+    placeholders = "(" + ", ".join(["%s"] * len(ROLLUP_COLUMNS)) + ")"
+
+    frappe.db.sql(
+        f"""INSERT INTO `tabScouting Rollup` ({", ".join(f"`{column}`" for column in ROLLUP_COLUMNS)})
+        VALUES {", ".join([placeholders] * len(values))}
+        ON DUPLICATE KEY UPDATE
+            `count` = `count` + VALUES(`count`),
+            `presence` = `presence` + VALUES(`presence`),
+            `modified` = VALUES(`modified`)""",
+        [value for row in values for value in row],
+    )
+
+    for date, greenhouse in {(delta[0], delta[1]) for delta in deltas if delta[-1] < 0}:
+        frappe.db.sql(
+            """DELETE FROM `tabScouting Rollup`
+            WHERE `date` = %s AND `greenhouse` = %s AND `presence` <= 0""",
+            (date, greenhouse),
+        )
+
+
+def update_scouting_rollup(doc, method=None):
+    """
+    doc_events handler for Scouting Entry (on_update, on_trash): applies the difference
+    between the entry's observations before and after the change. Inserts run on_update too,
+    with nothing before. Runs in the entry's transaction, so a rolled-back entry leaves no trace.
+    """
+    if method == "on_trash":
+        before, after = get_rollup_contributions(doc), {}
+    else:
+        previous = doc.get_doc_before_save()
+        before = get_rollup_contributions(previous) if previous else {}
+        after = get_rollup_contributions(doc)
+
+    deltas = []
+    for key in before.keys() | after.keys():
+        old_count, old_presence = before.get(key, (0.0, 0))
+        new_count, new_presence = after.get(key, (0.0, 0))
+        if (old_count, old_presence) != (new_count, new_presence):
+            deltas.append((*key, new_count - old_count, new_presence - old_presence))
+
+    apply_rollup_deltas(deltas)
+
+
+def get_rollup_rows(from_date=None, to_date=None, greenhouse=None, entries=None):
+    """
+    Rollup rows recomputed from the raw child rows in one grouped query: for a date window,
+    or with entries, per listed Scouting Entry with the entry name as the first column.
+    """
+    if entries:
+        conditions = "se.`name` IN %(entries)s"
+        entry_column, group_by = "se.`name`, ", "1, 2, 3, 4, 5, 6, 7, 8"
+    else:
+        conditions = "se.`date_of_capture` BETWEEN %(from_date)s AND %(to_date)s"
+        if greenhouse:
+            conditions += " AND se.`greenhouse` = %(greenhouse)s"
+        entry_column, group_by = "", "1, 2, 3, 4, 5, 6, 7"
+
+    selects = []
+    for observation_type, (table, parentfield, field, has_stage, has_count) in ROLLUP_TABLES.items():
+        stage = f"IFNULL(NULLIF(c.`stage`, ''), '{DEFAULT_STAGE}')" if has_stage else f"'{DEFAULT_STAGE}'"
+        value = "IF(IFNULL(c.`count`, 0) = 0, 1, c.`count`)" if has_count else "1"
+        selects.append(f"""
+            SELECT {entry_column}se.`date_of_capture`, IFNULL(se.`greenhouse`, ''), IFNULL(se.`bed`, ''),
+                IFNULL(se.`zone`, ''), '{observation_type}', c.`{field}`, {stage}, SUM({value}), COUNT(*)
+            FROM `tab{table}` c
+            JOIN `tabScouting Entry` se
+                ON se.`name` = c.`parent` AND c.`parenttype` = 'Scouting Entry'
+                AND c.`parentfield` = '{parentfield}'
+            WHERE {conditions} AND IFNULL(c.`{field}`, '') != ''
+            GROUP BY {group_by}""")
+
+    return frappe.db.sql(
+        " UNION ALL ".join(selects),
+        {
+            "from_date": from_date,
+            "to_date": to_date,
+            "greenhouse": greenhouse,
+            "entries": tuple(entries or ()),
+        },
+    )
+
+
+def move_rollup_zones(zone_moves):
+    """
+    Rollup deltas for entries whose zone was rewritten with raw SQL, which skips the doc hooks.
+    zone_moves is {entry name: (old zone, new zone)}; call it in the transaction of the UPDATE.
+    """
+    if not zone_moves:
+        return
+
+    deltas = {}
+    for entry, date, greenhouse, bed, _zone, observation_type, observation, stage, count, presence in (
+        get_rollup_rows(entries=list(zone_moves))
+    ):
+        old_zone, new_zone = zone_moves[entry]
+        for zone, sign in ((old_zone or "", -1), (new_zone or "", 1)):
+            key = (getdate(date), greenhouse, bed, zone, observation_type, observation, stage)
+            totals = deltas.setdefault(key, [0.0, 0])
+            totals[0] += sign * flt(count)
+            totals[1] += sign * cint(presence)
+
+    apply_rollup_deltas(
+        [(*key, count, presence) for key, (count, presence) in deltas.items() if count or presence]
+    )
+
+
+def rebuild_rollup_window(from_date, to_date, greenhouse=None):
+    """Replaces the rollup rows of a window with ones recomputed from the raw rows; returns the row count."""
+    filters = {"date": ["between", [from_date, to_date]]}
+    if greenhouse:
+        filters["greenhouse"] = greenhouse
+    frappe.db.delete("Scouting Rollup", filters)
+
+    timestamp, user = now(), frappe.session.user
+    rows = [
+        (frappe.generate_hash(length=10), timestamp, timestamp, user, user, *row)
+        for row in get_rollup_rows(from_date, to_date, greenhouse)
+    ]
+    frappe.db.bulk_insert("Scouting Rollup", fields=ROLLUP_COLUMNS, values=rows)
+    return len(rows)
+
+
+def rebuild_scouting_rollup(from_date=None, to_date=None, greenhouse=None):
+    """
+    Recomputes the rollup from the raw Scouting Entry rows, ROLLUP_CHUNK_DAYS at a time with a
+    commit after each window. Covers all history when no dates are given. Returns a summary.
+    """
+    if not from_date or not to_date:
+        first, last = frappe.db.sql(
+            "SELECT MIN(`date_of_capture`), MAX(`date_of_capture`) FROM `tabScouting Entry`"
+        )[0]
+        from_date, to_date = from_date or first, to_date or last
+
+    summary = {"from_date": None, "to_date": None, "windows": 0, "rows": 0}
+    if not from_date or not to_date:
+        return summary
+
+    start, end = getdate(from_date), getdate(to_date)
+    summary.update(from_date=str(start), to_date=str(end))
+    while start <= end:
+        stop = min(end, getdate(add_days(start, ROLLUP_CHUNK_DAYS - 1)))
+        summary["rows"] += rebuild_rollup_window(start, stop, greenhouse)
+        summary["windows"] += 1
+        frappe.db.commit()
+        start = getdate(add_days(stop, 1))
+    return summary
+
+
+@frappe.whitelist()
+def getScoutingRollup(from_date, to_date, greenhouse=None, observation_type=None, level="greenhouse"):
+    """
+    Daily scouting totals from the rollup table, grouped per greenhouse, bed or zone (level)
+    and per observation and stage.
+    """
+    if level not in ROLLUP_LEVELS:
+        frappe.throw(_("Level must be one of {0}.").format(", ".join(ROLLUP_LEVELS)))
+
+    conditions = ["`date` BETWEEN %(from_date)s AND %(to_date)s"]
+    if greenhouse:
+        conditions.append("`greenhouse` = %(greenhouse)s")
+    if observation_type:
+        conditions.append("`observation_type` = %(observation_type)s")
+    group_fields = ", ".join(f"`{field}`" for field in ["date", *ROLLUP_LEVELS[level], *ROLLUP_KEY_FIELDS[4:]])
+
+    return frappe.db.sql(
+        f"""SELECT {group_fields}, SUM(`count`) AS count, SUM(`presence`) AS presence
+        FROM `tabScouting Rollup`
+        WHERE {" AND ".join(conditions)}
+        GROUP BY {group_fields}
+        ORDER BY {group_fields}""",
+        {
+            "from_date": from_date,
+            "to_date": to_date,
+            "greenhouse": greenhouse,
+            "observation_type": observation_type,
+        },
+        as_dict=True,
+    )
@@ -0,0 +1,220 @@
+import hashlib
+import json
+
+import frappe
+import numpy as np
+import shapely
+from frappe.utils import cint
+from werkzeug.wrappers import Response
+
+from upande_scp.serverscripts.map_tiles import get_map_geometry_version
+from upande_scp.serverscripts.zone_index import get_utm_to_wgs84_transformer, parse_zone_line
+
+ZONE_GEOMETRY_CACHE_KEY = "upande_scp:zone_geometry"
+ZONE_GEOMETRY_BUNDLE_CACHE_KEY = "upande_scp:zone_geometry_bundle"
+ZONE_GEOMETRY_BUNDLE_METHOD = "/api/method/upande_scp.serverscripts.zone_geometry.getZoneGeometryBundle"
+
+# Simplification tolerance (metres, applied in UTM) and decimal places kept per level of detail.
+# 6 decimals is ~0.1 m on the ground, 5 decimals ~1 m.
+ZONE_GEOMETRY_LODS = {
+    "full": {"tolerance_m": 0.0, "precision": 7},
+    "high": {"tolerance_m": 0.05, "precision": 6},
+    "medium": {"tolerance_m": 0.25, "precision": 6},
+    "low": {"tolerance_m": 1.0, "precision": 5},
+}
+DEFAULT_LOD = "full"
+
+# (version, {lod: zones}) loaded by this worker
+_local_geometries = None
+
+
+def get_lod(lod=None, zoom=None):
+    """Picks the level of detail from an explicit lod, or from a Leaflet zoom level."""
+    if lod:
+        if lod not in ZONE_GEOMETRY_LODS:
+            frappe.throw(f"Invalid lod {lod}. Use one of: {', '.join(ZONE_GEOMETRY_LODS)}")
+        return lod
+
+    if zoom in (None, ""):
+        return DEFAULT_LOD
+
+    zoom = cint(zoom)
+    if zoom >= 20:
+        return "full"
+    if zoom >= 19:
+        return "high"
+    if zoom >= 17:
+        return "medium"
+    return "low"
+
+
+def dump_zone_geojson(raw, coords):
+    """Rewrites a zone's FeatureCollection with new coordinates, keeping its feature properties."""
+    feature = raw["features"][0]
+    return json.dumps({
+        "type": "FeatureCollection",
+        "features": [{
+            "type": "Feature",
+            "properties": feature.get("properties") or {},
+            "geometry": {"type": "LineString", "coordinates": coords},
+        }],
+    }, separators=(",", ":"))
+
+
+def simplify_zone_lines(zones):
+    """
+    Returns {lod: [rounded WGS84 coordinate lists]} for zones that carry a UTM line.
+    Lines are simplified in metres in their own UTM zone, then converted back.
+    """
+    simplified = {lod: [None] * len(zones) for lod in ZONE_GEOMETRY_LODS}
+
+    rows_by_epsg = {}
+    for row, zone in enumerate(zones):
+        if zone.utm_wkb and zone.utm_epsg:
+            rows_by_epsg.setdefault(zone.utm_epsg, []).append(row)
+
+    for utm_epsg, rows in rows_by_epsg.items():
+        lines = shapely.from_wkb([zones[row].utm_wkb for row in rows])
+        transformer = get_utm_to_wgs84_transformer(utm_epsg)
+
+        for lod, options in ZONE_GEOMETRY_LODS.items():
+            level_lines = lines
+            if options["tolerance_m"]:
+                level_lines = shapely.simplify(lines, options["tolerance_m"], preserve_topology=True)
+            level_lines = shapely.transform(
+                level_lines, lambda coords: np.column_stack(transformer.transform(coords[:, 0], coords[:, 1]))
+            )
+            for row, line in zip(rows, level_lines, strict=True):
+                coords = np.round(shapely.get_coordinates(line), options["precision"])
+                simplified[lod][row] = coords.tolist()
+
+    return simplified
+
+
+def build_zone_geometries():
+    """Builds every level of detail from the stored UTM lines in one pass."""
+    zones = frappe.get_all(
+        "Zone",
+        filters={"raw_geojson": ["is", "set"]},
+        fields=["name", "bed", "raw_geojson", "utm_epsg", "utm_wkb"],
+        order_by="name asc"
+    )
+    simplified = simplify_zone_lines(zones)
+
+    levels = {lod: [] for lod in ZONE_GEOMETRY_LODS}
+    for row, zone in enumerate(zones):
+        try:
+            raw = json.loads(zone.raw_geojson)
+            coords = parse_zone_line(zone.raw_geojson)
+        except Exception as e:
+            frappe.log_error(f"Error processing zone {zone.name}", str(e))
+            continue
+
+        for lod, options in ZONE_GEOMETRY_LODS.items():
+            if not coords:
+                # Not a LineString zone; pass it through untouched
+                geojson = json.dumps(raw, separators=(",", ":"))
+            elif simplified[lod][row] is not None:
+                geojson = dump_zone_geojson(raw, simplified[lod][row])
+            else:
+                geojson = dump_zone_geojson(raw, np.round(coords, options["precision"]).tolist())
+
+            levels[lod].append({"name": zone.name, "bed": zone.bed, "raw_geojson": geojson})
+
+    return levels
+
+
+def get_zone_geometries(lod=None, zoom=None):
+    """
+    Returns [{"name", "bed", "raw_geojson"}] for every mapped zone at the requested level of detail.
+    raw_geojson keeps the FeatureCollection string shape the map pages already parse.
+    """
+    global _local_geometries
+    lod = get_lod(lod, zoom)
+    version = get_map_geometry_version()
+
+    if _local_geometries and _local_geometries[0] == version:
+        return _local_geometries[1][lod]
+
+    cache = frappe.cache()
+    payload = cache.get_value(ZONE_GEOMETRY_CACHE_KEY)
+    if payload and payload.get("version") == version:
+        levels = payload["levels"]
+    else:
+        levels = build_zone_geometries()
+        cache.set_value(ZONE_GEOMETRY_CACHE_KEY, {"version": version, "levels": levels})
+
+    _local_geometries = (version, levels)
+    return levels[lod]
+
+
+def get_geometry_state():
+    """Fingerprint of Zone/Bed modification state; any saved change moves it."""
+    state = frappe.db.sql(
+        """SELECT
+            (SELECT COUNT(*) FROM `tabZone`), (SELECT MAX(`modified`) FROM `tabZone`),
+            (SELECT COUNT(*) FROM `tabBed`), (SELECT MAX(`modified`) FROM `tabBed`)"""
+    )[0]
+    return ":".join(str(value) for value in state) + ":" + get_map_geometry_version()
+
+
+def get_geometry_bundle(lod=None, zoom=None):
+    """
+    Returns {"lod", "hash", "body"} for the zone geometry bundle at a level of detail.
+    hash is the SHA-1 of the body, so it only changes when the geometry served changes.
+    """
+    lod = get_lod(lod, zoom)
+    state = get_geometry_state()
+    cache = frappe.cache()
+
+    bundle = cache.hget(ZONE_GEOMETRY_BUNDLE_CACHE_KEY, lod)
+    if bundle and bundle["state"] == state:
+        return bundle
+
+    body = json.dumps(get_zone_geometries(lod), separators=(",", ":")).encode()
+    bundle = {"lod": lod, "state": state, "hash": hashlib.sha1(body).hexdigest()[:20], "body": body}
+    cache.hset(ZONE_GEOMETRY_BUNDLE_CACHE_KEY, lod, bundle)
+    return bundle
+
+
+def get_geometry_bundle_ref(lod=None, zoom=None):
+    """Reference the map pages use to fetch (or reuse from browser cache) the geometry bundle."""
+    bundle = get_geometry_bundle(lod, zoom)
+    return {
+        "version": bundle["hash"],
+        "lod": bundle["lod"],
+        "url": f"{ZONE_GEOMETRY_BUNDLE_METHOD}?lod={bundle['lod']}&v={bundle['hash']}",
+    }
+
+
+def get_map_zone_geometries(form_dict):
+    """
+    Zone geometry for a map endpoint request, plus the bundle reference.
+    With geometry=ref the zones carry only name and bed and their lines come from the bundle;
+    otherwise the lines are inline and the reference is None, so the bundle is not built.
+    """
+    lod = get_lod(form_dict.get("lod"), form_dict.get("zoom"))
+    zones = get_zone_geometries(lod)
+    if form_dict.get("geometry") != "ref":
+        return zones, None
+    return [{"name": zone["name"], "bed": zone["bed"]} for zone in zones], get_geometry_bundle_ref(lod)
+
+
+@frappe.whitelist()
+def getZoneGeometryBundle(lod=None, zoom=None, v=None):
+    """
+    All zone geometry at one level of detail, with an ETag of its content hash.
+    Requests carrying the current hash as v are cached by the browser for a year.
+    """
+    bundle = get_geometry_bundle(lod, zoom)
+    etag = f'"{bundle["hash"]}"'
+    if v == bundle["hash"]:
+        cache_control = "private, max-age=31536000, immutable"
+    else:
+        cache_control = "private, no-cache"
+
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if frappe.request and frappe.request.headers.get("If-None-Match") == etag:
+        return Response(status=304, headers=headers)
+
+    return Response(bundle["body"], mimetype="application/json", headers=headers)
@@ -0,0 +1,544 @@
+import json
+from collections import Counter
+from functools import lru_cache
+
+import frappe
+import numpy as np
+import shapely
+from pyproj import Transformer
+from shapely.geometry import Point
+from shapely.strtree import STRtree
+
+ZONE_INDEX_CACHE_KEY = "upande_scp:zone_index"
+ZONE_INDEX_VERSION_KEY = "upande_scp:zone_index_version"
+
+# Key used for the farm-wide index when no greenhouse is known
+ALL_GREENHOUSES = "__all__"
+
+# Map Settings.zone_distance_mode options
+ZONE_DISTANCE_MODE_UTM = "UTM"
+ZONE_DISTANCE_MODE_LOCAL = "Local Tangent Plane"
+
+# WGS84 ellipsoid
+WGS84_A = 6378137.0
+WGS84_E2 = 6.69437999014e-3
+
+# Indexes already loaded by this worker, keyed by greenhouse.
+# Each value is a (version, mode, ZoneIndex) tuple checked against Redis on every lookup.
+_local_indexes = {}
+
+
+def get_dynamic_utm_epsg(latitude, longitude):
+    """Calculates the correct UTM EPSG code based on a point's coordinates."""
+
+    # 1. Determine Zone Number (1 to 60)
+    zone_number = int((longitude + 180) / 6) + 1
+
+    # 2. Determine Hemisphere Prefix (326 for N, 327 for S)
+    if latitude >= 0:
+        epsg_prefix = 326 # Northern Hemisphere
+    else:
+        epsg_prefix = 327 # Southern Hemisphere
+
+    # 3. Construct the full EPSG code string
+    return f"EPSG:{epsg_prefix}{zone_number:02d}"
+
+
+@lru_cache(maxsize=16)
+def get_utm_transformer(utm_epsg):
+    """Returns a cached WGS84 -> UTM transformer for the given EPSG code."""
+    return Transformer.from_crs("EPSG:4326", utm_epsg, always_xy=True)
+
+
+def get_zone_distance_mode():
+    return frappe.db.get_single_value("Map Settings", "zone_distance_mode", cache=True) or ZONE_DISTANCE_MODE_UTM
+
+
+def _geodetic_to_ecef(lons, lats):
+    lon = np.radians(np.asarray(lons, dtype=float))
+    lat = np.radians(np.asarray(lats, dtype=float))
+    sin_lat = np.sin(lat)
+    n = WGS84_A / np.sqrt(1 - WGS84_E2 * sin_lat**2)
+    return (
+        n * np.cos(lat) * np.cos(lon),
+        n * np.cos(lat) * np.sin(lon),
+        n * (1 - WGS84_E2) * sin_lat,
+    )
+
+
+def local_plane_project(lons, lats, reference):
+    """
+    Projects WGS84 coordinates onto the east/north tangent plane at reference (lat, lon).
+    Plain NumPy; distances stay within millimetres of the ground over a few kilometres.
+    """
+    lat0, lon0 = reference
+    x, y, z = _geodetic_to_ecef(lons, lats)
+    x0, y0, z0 = _geodetic_to_ecef(lon0, lat0)
+    dx, dy, dz = x - x0, y - y0, z - z0
+
+    sin_lat0, cos_lat0 = np.sin(np.radians(lat0)), np.cos(np.radians(lat0))
+    sin_lon0, cos_lon0 = np.sin(np.radians(lon0)), np.cos(np.radians(lon0))
+
+    east = -sin_lon0 * dx + cos_lon0 * dy
+    north = -sin_lat0 * cos_lon0 * dx - sin_lat0 * sin_lon0 * dy + cos_lat0 * dz
+    return east, north
+
+
+def parse_zone_line(raw_geojson):
+    """
+    Extracts the LineString coordinates from a zone's FeatureCollection string.
+    Returns None if the GeoJSON does not hold a usable LineString.
+    """
+    if not raw_geojson:
+        return None
+
+    geojson_data = json.loads(raw_geojson)
+
+    if geojson_data.get("type") != "FeatureCollection" or not geojson_data.get("features"):
+        return None
+
+    geometry = geojson_data["features"][0].get("geometry") or {}
+    if geometry.get("type") != "LineString":
+        return None
+
+    coords = geometry.get("coordinates", [])
+    if len(coords) < 2:
+        return None
+
+    return [(float(c[0]), float(c[1])) for c in coords]
+
+
+def zone_confidences(distances, accuracies, buffers):
+    """Vectorized zone_confidence over arrays of distances, accuracies and buffers (metres)."""
+    distances = np.asarray(distances, dtype=float)
+    accuracies = np.asarray(accuracies, dtype=float)
+    inside = distances < np.asarray(buffers, dtype=float)
+
+    conditions = [
+        # Point is within the buffered zone
+        inside & (distances <= accuracies * 0.3),  # Excellent - right on the line
+        inside & (distances <= accuracies * 0.6),  # Very good
+        inside & (distances <= accuracies),  # Good - within accuracy circle
+        inside,  # Acceptable - within buffer
+        # Lower confidence if outside buffer
+        distances <= accuracies * 1.5,  # Fair - close but outside buffer
+        distances <= accuracies * 2.0,  # Poor - might be adjacent zone
+    ]
+    choices = [1.0, 0.9, 0.8, 0.7, 0.5, 0.3]
+
+    # Very poor - likely wrong zone
+    return np.select(conditions, choices, default=0.1)
+
+
+def zone_confidence(distance_m, accuracy_m, buffer_m):
+    """Scores how likely a point belongs to a zone given its distance to the zone line."""
+    return float(zone_confidences([distance_m], [accuracy_m], [buffer_m])[0])
+
+
+def zone_buffer(accuracy_m):
+    """Adaptive buffer (metres) around a zone line based on the GPS accuracy."""
+    return np.clip(accuracy_m, 3.0, 50.0) if np.ndim(accuracy_m) else max(3.0, min(accuracy_m, 50.0))
+
+
+class ZoneIndex:
+    """
+    STRtree over the projected zone lines of one greenhouse.
+    Lines are in UTM, or on a local tangent plane when a reference (lat, lon) is set.
+    """
+
+    def __init__(self, utm_epsg, names, beds, geometries, reference=None):
+        self.utm_epsg = utm_epsg
+        self.reference = tuple(reference) if reference else None
+        self.names = list(names)
+        self.beds = list(beds)
+        self.geometries = np.asarray(geometries, dtype=object)
+        self.tree = STRtree(self.geometries)
+
+        self.bed_positions = {}
+        for position, bed in enumerate(self.beds):
+            self.bed_positions.setdefault(bed, []).append(position)
+        self.bed_positions = {bed: np.asarray(p) for bed, p in self.bed_positions.items()}
+
+    def __len__(self):
+        return len(self.names)
+
+    def has_bed(self, bed):
+        return bed in self.bed_positions
+
+    def project_coords(self, longitudes, latitudes):
+        """Projects WGS84 coordinates into the index's metric frame."""
+        if self.reference:
+            return local_plane_project(longitudes, latitudes, self.reference)
+        return get_utm_transformer(self.utm_epsg).transform(longitudes, latitudes)
+
+    def project(self, latitude, longitude):
+        """Projects a WGS84 point into the index's metric frame."""
+        x, y = self.project_coords(longitude, latitude)
+        return Point(float(x), float(y))
+
+    def nearest(self, point, bed=None):
+        """Returns (zone name, distance in metres) of the zone line closest to a projected point."""
+        if not len(self):
+            return None, None
+
+        if bed:
+            positions = self.bed_positions.get(bed)
+            if positions is None:
+                return None, None
+            distances = shapely.distance(self.geometries[positions], point)
+            best = int(np.argmin(distances))
+            return self.names[positions[best]], float(distances[best])
+
+        positions, distances = self.tree.query_nearest(point, return_distance=True)
+        return self.names[int(positions[0])], float(distances[0])
+
+    def locate_batch(self, latitudes, longitudes, accuracies, beds=None):
+        """
+        Matches many WGS84 points at once.
+        All points are projected in a single transformer call and measured against
+        the candidate zones with shapely array operations.
+        Returns (zones, distances, confidences) arrays aligned with the input;
+        rows without a candidate zone get None / nan / 0.0.
+        """
+        count = len(latitudes)
+        zones = np.full(count, None, dtype=object)
+        distances = np.full(count, np.nan)
+        confidences = np.zeros(count)
+
+        if not count or not len(self):
+            return zones, distances, confidences
+
+        xs, ys = self.project_coords(
+            np.asarray(longitudes, dtype=float),
+            np.asarray(latitudes, dtype=float)
+        )
+        points = shapely.points(xs, ys)
+        beds = np.asarray(beds if beds is not None else [None] * count, dtype=object)
+        names = np.asarray(self.names, dtype=object)
+
+        # Points without a bed: nearest zone in the whole greenhouse
+        free_rows = np.flatnonzero(np.asarray([not bed for bed in beds]))
+        if len(free_rows):
+            (input_rows, tree_rows), nearest = self.tree.query_nearest(
+                points[free_rows], return_distance=True, all_matches=False
+            )
+            zones[free_rows[input_rows]] = names[tree_rows]
+            distances[free_rows[input_rows]] = nearest
+
+        # Points with a bed: distance matrix against that bed's zones only
+        for bed in {bed for bed in beds if bed}:
+            positions = self.bed_positions.get(bed)
+            if positions is None:
+                continue
+            rows = np.flatnonzero(beds == bed)
+            matrix = shapely.distance(points[rows][:, np.newaxis], self.geometries[positions][np.newaxis, :])
+            best = np.argmin(matrix, axis=1)
+            zones[rows] = names[positions[best]]
+            distances[rows] = matrix[np.arange(len(rows)), best]
+
+        matched = ~np.isnan(distances)
+        accuracies = np.asarray(accuracies, dtype=float)
+        confidences[matched] = zone_confidences(
+            distances[matched], accuracies[matched], zone_buffer(accuracies[matched])
+        )
+        return zones, distances, confidences
+
+    def within(self, point, distance_m, bed=None):
+        """Returns the zone names whose line lies within distance_m of a projected point."""
+        positions = sorted(self.tree.query(point, predicate="dwithin", distance=distance_m))
+        return [self.names[p] for p in positions if not bed or self.beds[p] == bed]
+
+    def to_cache(self):
+        return {
+            "utm_epsg": self.utm_epsg,
+            "reference": self.reference,
+            "names": self.names,
+            "beds": self.beds,
+            "wkb": [bytes(w) for w in shapely.to_wkb(self.geometries)],
+        }
+
+    @classmethod
+    def from_cache(cls, payload):
+        return cls(
+            payload["utm_epsg"],
+            payload["names"],
+            payload["beds"],
+            shapely.from_wkb(payload["wkb"]),
+            reference=payload.get("reference"),
+        )
+
+
+def project_zone_geometry(raw_geojson):
+    """
+    Projects a zone's GeoJSON line to UTM.
+    Returns the values stored on the Zone (EPSG and hex WKB),
+    or empty values if the GeoJSON holds no usable line.
+    """
+    coords = parse_zone_line(raw_geojson)
+    if not coords:
+        return {"utm_epsg": None, "utm_wkb": None}
+
+    first_lon, first_lat = coords[0]
+    utm_epsg = get_dynamic_utm_epsg(first_lat, first_lon)
+
+    lons, lats = zip(*coords, strict=True)
+    xs, ys = get_utm_transformer(utm_epsg).transform(lons, lats)
+    line_utm = shapely.linestrings(np.column_stack([xs, ys]))
+
+    return {
+        "utm_epsg": utm_epsg,
+        "utm_wkb": shapely.to_wkb(line_utm, hex=True),
+    }
+
+
+@lru_cache(maxsize=16)
+def get_utm_to_wgs84_transformer(utm_epsg):
+    return Transformer.from_crs(utm_epsg, "EPSG:4326", always_xy=True)
+
+
+def utm_to_local_plane(geometries, utm_epsg):
+    """
+    Moves UTM geometries onto a tangent plane centred on their bounding box.
+    Returns the geometries and the (lat, lon) reference point.
+    """
+    transformer = get_utm_to_wgs84_transformer(utm_epsg)
+    wgs84 = shapely.transform(
+        geometries,
+        lambda coords: np.column_stack(transformer.transform(coords[:, 0], coords[:, 1])),
+    )
+    min_lon, min_lat, max_lon, max_lat = shapely.total_bounds(wgs84)
+    reference = (float(min_lat + max_lat) / 2, float(min_lon + max_lon) / 2)
+
+    local = shapely.transform(
+        wgs84,
+        lambda coords: np.column_stack(local_plane_project(coords[:, 0], coords[:, 1], reference)),
+    )
+    return local, reference
+
+
+@lru_cache(maxsize=16)
+def get_utm_to_utm_transformer(source_epsg, target_epsg):
+    return Transformer.from_crs(source_epsg, target_epsg, always_xy=True)
+
+
+def reproject_geometries(geometries, source_epsg, target_epsg):
+    """Moves stored UTM geometries into a neighbouring UTM zone."""
+    transformer = get_utm_to_utm_transformer(source_epsg, target_epsg)
+    return shapely.transform(
+        geometries,
+        lambda coords: np.column_stack(transformer.transform(coords[:, 0], coords[:, 1])),
+    )
+
+
+def build_zone_index(greenhouse, mode=ZONE_DISTANCE_MODE_UTM):
+    """Loads the stored UTM geometry of a greenhouse's zones in bulk."""
+    filters = {"utm_wkb": ["is", "set"]}
+    if greenhouse != ALL_GREENHOUSES:
+        filters["greenhouse"] = greenhouse
+
+    zones = frappe.get_all(
+        "Zone",
+        filters=filters,
+        fields=["name", "bed", "utm_epsg", "utm_wkb"],
+        order_by="name asc"
+    )
+
+    if not zones:
+        return ZoneIndex(None, [], [], [])
+
+    geometries = shapely.from_wkb([zone.utm_wkb for zone in zones])
+    epsg_codes = np.asarray([zone.utm_epsg for zone in zones], dtype=object)
+
+    # A farm straddling a UTM boundary is indexed in its majority zone
+    utm_epsg = Counter(epsg_codes).most_common(1)[0][0]
+    for source_epsg in set(epsg_codes) - {utm_epsg}:
+        mask = epsg_codes == source_epsg
+        geometries[mask] = reproject_geometries(geometries[mask], source_epsg, utm_epsg)
+
+    reference = None
+    if mode == ZONE_DISTANCE_MODE_LOCAL:
+        geometries, reference = utm_to_local_plane(geometries, utm_epsg)
+
+    return ZoneIndex(
+        utm_epsg,
+        [zone.name for zone in zones],
+        [zone.bed for zone in zones],
+        geometries,
+        reference=reference,
+    )
+
+
+def get_zone_index(greenhouse=None):
+    """
+    Returns the zone index for a greenhouse.
+    Lookup order: this worker's memory, then Redis, then a rebuild from the database.
+    """
+    greenhouse = greenhouse or ALL_GREENHOUSES
+    mode = get_zone_distance_mode()
+    cache = frappe.cache()
+
+    version = cache.hget(ZONE_INDEX_VERSION_KEY, greenhouse)
+    if version is None:
+        version = frappe.generate_hash(length=10)
+        cache.hset(ZONE_INDEX_VERSION_KEY, greenhouse, version)
+
+    local = _local_indexes.get(greenhouse)
+    if local and local[:2] == (version, mode):
+        return local[2]
+
+    payload = cache.hget(ZONE_INDEX_CACHE_KEY, greenhouse)
+    if payload and payload.get("version") == version and payload.get("mode") == mode:
+        index = ZoneIndex.from_cache(payload)
+    else:
+        index = build_zone_index(greenhouse, mode)
+        cache.hset(ZONE_INDEX_CACHE_KEY, greenhouse, {**index.to_cache(), "version": version, "mode": mode})
+
+    _local_indexes[greenhouse] = (version, mode, index)
+    return index
+
+
+@frappe.whitelist()
+def validate_local_projection(tolerance_m=0.05, offsets_m="0.5,2,5,15"):
+    """
+    Compares Local Tangent Plane distances against UTM for every stored zone.
+    Test points are placed at the given offsets (metres, east and north) from
+    each zone vertex and measured against their own zone in both frames.
+    Run before switching Map Settings.zone_distance_mode:
+
+        bench execute upande_scp.serverscripts.zone_index.validate_local_projection
+    """
+    frappe.only_for("System Manager")
+
+    tolerance_m = float(tolerance_m)
+    offsets = [float(o) for o in str(offsets_m).split(",") if o.strip()]
+    greenhouses = [
+        g.greenhouse for g in frappe.get_all(
+            "Zone",
+            filters={"utm_wkb": ["is", "set"]},
+            fields=["greenhouse"],
+            distinct=True
+        )
+    ]
+
+    report = {"tolerance_m": tolerance_m, "greenhouses": {}, "max_error_m": 0.0, "points": 0}
+
+    for greenhouse in greenhouses:
+        utm_index = build_zone_index(greenhouse or ALL_GREENHOUSES, ZONE_DISTANCE_MODE_UTM)
+        local_index = build_zone_index(greenhouse or ALL_GREENHOUSES, ZONE_DISTANCE_MODE_LOCAL)
+        if not len(utm_index):
+            continue
+
+        # Test points built in UTM around every vertex, converted back to WGS84
+        coords, zone_rows = shapely.get_coordinates(utm_index.geometries, return_index=True)
+        test_x, test_y, test_rows = [], [], []
+        for offset in offsets:
+            for dx, dy in ((offset, 0.0), (0.0, offset), (-offset, 0.0), (0.0, -offset)):
+                test_x.append(coords[:, 0] + dx)
+                test_y.append(coords[:, 1] + dy)
+                test_rows.append(zone_rows)
+        test_x, test_y, test_rows = np.concatenate(test_x), np.concatenate(test_y), np.concatenate(test_rows)
+        lons, lats = get_utm_to_wgs84_transformer(utm_index.utm_epsg).transform(test_x, test_y)
+
+        utm_points = shapely.points(*utm_index.project_coords(lons, lats))
+        local_points = shapely.points(*local_index.project_coords(lons, lats))
+        errors = np.abs(
+            shapely.distance(utm_points, utm_index.geometries[test_rows])
+            - shapely.distance(local_points, local_index.geometries[test_rows])
+        )
+
+        utm_nearest = utm_index.tree.query_nearest(utm_points, all_matches=False)[1]
+        local_nearest = local_index.tree.query_nearest(local_points, all_matches=False)[1]
+
+        max_error = float(errors.max())
+        report["greenhouses"][greenhouse or ALL_GREENHOUSES] = {
+            "zones": len(utm_index),
+            "points": len(errors),
+            "max_error_m": round(max_error, 4),
+            "mean_error_m": round(float(errors.mean()), 4),
+            "p99_error_m": round(float(np.percentile(errors, 99)), 4),
+            "nearest_zone_agreement": round(float(np.mean(utm_nearest == local_nearest)), 4),
+            "passes": max_error <= tolerance_m,
+        }
+        report["max_error_m"] = max(report["max_error_m"], round(max_error, 4))
+        report["points"] = report["points"] + len(errors)
+
+    report["passes"] = all(g["passes"] for g in report["greenhouses"].values())
+    return report
+
+
+def bump_zone_index_versions(keys):
+    cache = frappe.cache()
+    for key in keys:
+        cache.hdel(ZONE_INDEX_CACHE_KEY, key)
+        cache.hset(ZONE_INDEX_VERSION_KEY, key, frappe.generate_hash(length=10))
+        _local_indexes.pop(key, None)
+
+
+def bump_pending_zone_indexes():
+    """after_commit / after_rollback callback: moves the versions of the indexes invalidated in the transaction."""
+    keys = frappe.flags.pop("pending_zone_indexes", None)
+    if keys:
+        bump_zone_index_versions(keys)
+
+
+def invalidate_zone_index(greenhouse=None):
+    """
+    Drops the cached index of a greenhouse (and the farm-wide index) on every worker.
+    The versions move again after commit, so an index another request rebuilt from the
+    old committed rows in between is dropped too.
+    """
+    keys = {greenhouse or ALL_GREENHOUSES, ALL_GREENHOUSES}
+    bump_zone_index_versions(keys)
+
+    if frappe.flags.pending_zone_indexes is None:
+        frappe.flags.pending_zone_indexes = set()
+        frappe.db.after_commit.add(bump_pending_zone_indexes)
+        # This transaction may itself have cached an index of rows that are now rolled back
+        frappe.db.after_rollback.add(bump_pending_zone_indexes)
+    frappe.flags.pending_zone_indexes.update(keys)
+
+
+def on_zone_change(doc, method=None, *args):
+    """doc_events handler for Zone: rebuild the index of the old and new greenhouse."""
+    invalidate_zone_index(doc.greenhouse)
+
+    previous = doc.get_doc_before_save()
+    if previous and previous.greenhouse != doc.greenhouse:
+        invalidate_zone_index(previous.greenhouse)
+
+
+def update_zone_geometry(doc, method=None):
+    """doc_events handler (Zone validate): keeps the stored UTM geometry in step with raw_geojson."""
+    if doc.utm_wkb and not doc.has_value_changed("raw_geojson"):
+        return
+
+    try:
+        values = project_zone_geometry(doc.raw_geojson)
+    except Exception as e:
+        frappe.log_error(f"Error projecting zone {doc.name}", str(e))
+        values = project_zone_geometry(None)
+
+    doc.update(values)
+
+
+def refresh_greenhouse_zone_geometry(doc, method=None):
+    """
+    doc_events handler (Bed And Zone Automation on_update): re-projects every zone
+    of the greenhouse and rebuilds its index.
+    """
+    greenhouse = doc.greenhouse or doc.name
+    zones = frappe.get_all(
+        "Zone",
+        filters={"greenhouse": greenhouse},
+        fields=["name", "raw_geojson"]
+    )
+
+    for zone in zones:
+        try:
+            values = project_zone_geometry(zone.raw_geojson)
+        except Exception as e:
+            frappe.log_error(f"Error projecting zone {zone.name}", str(e))
+            continue
+        frappe.db.set_value("Zone", zone.name, values, update_modified=False)
+
+    invalidate_zone_index(greenhouse)
@@ -4,6 +4,10 @@
 # import frappe
 from frappe.model.document import Document
 
+from upande_scp.serverscripts.naming import set_time_ordered_name
+
 
 class ScoutingEntry(Document):
-	pass
+	def autoname(self):
+		# Leaves the name unset in the default mode, so the naming series applies
+		set_time_ordered_name(self, "SCE")
@@ -0,0 +1,17 @@
+# Copyright (c) 2026, Upande and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+from upande_scp.serverscripts.scouting_rollup import ROLLUP_KEY_FIELDS
+
+
+class ScoutingRollup(Document):
+	pass
+
+
+def on_doctype_update():
+	# Hooks upsert into the row of their key; date first so date-range reads use it too
+	frappe.db.add_unique("Scouting Rollup", ROLLUP_KEY_FIELDS, constraint_name="unique_rollup_key")
+	frappe.db.add_index("Scouting Rollup", ["greenhouse", "date"])
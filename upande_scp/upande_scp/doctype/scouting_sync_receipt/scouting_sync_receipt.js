@@ -0,0 +1,8 @@
+// Copyright (c) 2026, Upande and contributors
+// For license information, please see license.txt
+
+// frappe.ui.form.on("Scouting Sync Receipt", {
+// 	refresh(frm) {
+
+// 	},
+// });